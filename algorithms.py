@@ -0,0 +1,54 @@
+from brains.approximation import Brain_Approximation
+from brains.montecarlo import Brain_MonteCarlo
+from brains.negamax_abp import Brain_Negamax_ABP
+from brains.proofnumber import Brain_ProofNumber
+from brains.qlearning import Brain_QLearning
+from brains.random import Brain_Random
+from brains.threatspace import Brain_ThreatSpace
+
+
+# Brains selectable from the menu; kept out of constants so every module can import constants
+ALGORITHMS = {
+    "Negamax":
+        {
+            "name": "Negamax",
+            "description": "Negamax is an algorithm that will evaluate all possible boards to search for a best move. Negamax is a variant to Minimax.",
+            "brain": Brain_Negamax_ABP
+        },
+    "MCTS":
+        {
+            "name": "Monte Carlo Tree Search",
+            "description": "Monte Carlo Tree Search is an algorithm that selects a best move based on simulations of playing that move. After many simulations, the algorithm selects a best move through analysing win-rate.",
+            "brain": Brain_MonteCarlo
+        },
+    "QLearning":
+        {
+            "name": "Reinforcement Learning",
+            "description": "Reinforcement Learning is a machine learning algorithm that learns the best move through analysing which moves results in positive outcomes for the AI for thousands of test games.",
+            "brain": Brain_QLearning
+        },
+    "Approximation":
+        {
+            "name": "Function Approximation",
+            "description": "Function Approximation learns like Reinforcement Learning, but values moves with a small neural network over the rows each move makes or blocks instead of remembering every board. It can learn boards far too large for a table of every board seen.",
+            "brain": Brain_Approximation
+        },
+    "ProofNumber":
+        {
+            "name": "Proof-Number Search",
+            "description": "Proof-Number Search tries to prove whether a move forces a win or a draw, always searching the moves closest to a proof. It can answer positions too large for Negamax to search fully.",
+            "brain": Brain_ProofNumber
+        },
+    "ThreatSpace":
+        {
+            "name": "Threat-Space Search",
+            "description": "Threat-Space Search only considers moves that threaten to win and the replies they force, quickly finding wins made from several threats at once. Otherwise it blocks and plays the most open square.",
+            "brain": Brain_ThreatSpace
+        },
+    "Random":
+        {
+            "name": "Random",
+            "description": "Random moves picked.",
+            "brain": Brain_Random
+        }
+}
@@ -0,0 +1,46 @@
+import time
+from math import inf
+
+import constants
+from board import Board
+from brains.negamax_abp import Brain_Negamax_ABP
+from player import Player
+
+# Depth to search from an empty board for each configuration. None searches to the end of the game.
+BENCHMARK_DEPTHS = {
+    3: None,
+    5: 8,
+    7: 6
+}
+
+
+def benchmark_search_drivers(size, max_depth):
+    # Initialise board
+    board = Board(constants.CONFIGURATIONS[size])
+
+    player_x = Player(constants.CROSS, None)
+    player_o = Player(constants.NOUGHT, None)
+
+    board.player_x = player_x
+    board.player_o = player_o
+
+    print("{size}x{size}, depth {depth}:".format(size=size, depth=max_depth if max_depth is not None else "full"))
+
+    for search_driver in ("alphabeta", "pvs", "aspiration", "mtdf"):
+        # Start every driver from an empty transposition table
+        brain = Brain_Negamax_ABP(player_x, player_o, board)
+        brain.saved_scores.clear()
+        brain.search_driver = search_driver
+        brain.max_depth = max_depth
+        brain.time_limit = inf
+
+        time_before = time.time()
+        board_move, _ = brain.get_move()
+
+        print("{:>12}: {:>9} nodes, {:>5.1%} cutoff rate, move {:>2}, {:.2f}s".format(
+            search_driver, brain.nodes, brain.cutoffs / max(1, brain.expanded), board_move, time.time() - time_before))
+
+
+if __name__ == '__main__':
+    for size, depth in BENCHMARK_DEPTHS.items():
+        benchmark_search_drivers(size, depth)
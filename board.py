@@ -1,122 +1,228 @@
 import copy
-import itertools
+import operator
 import os
-from math import inf
 
 import numpy as np
 
 import constants
+from geometry import get_dimensions, get_geometry
+
+
+def iterate_bits(mask):
+    # Yield the index of every set bit, lowest first
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
 
 
 class Board:
 
     def __init__(self, configuration):
-        self.board = None
-
         self.player_x = None
         self.player_o = None
 
         self.configuration = configuration
-        self.size = configuration["size"]
+        self.rows, self.columns = get_dimensions(configuration)
+        # Moves are numbered row by row, so move // size is the move's row. For square boards this is the board size.
+        self.size = self.columns
         self.squares = configuration["squares"]
         self.symbols_needed = configuration["symbols_needed"]
 
-        # Create brain folders
-        brain_path = os.path.join("brain_data", "{}x{}".format(self.size, self.size))
-        if not os.path.exists(brain_path):
-            print("No save folder found for {}x{} board. Creating folder now.".format(self.size, self.size))
-            os.mkdir(brain_path)
+        # Precomputed win windows & masks for this configuration
+        self.geometry = get_geometry(configuration)
 
-        self.brain_data_folder = os.path.join("brain_data", "{size}x{size}".format(size=self.size))
+        # Brains save their data here. The folder is only created when something is saved.
+        self.brain_data_folder = os.path.join("brain_data", "{}x{}".format(self.rows, self.columns))
 
         # Reset board
         self.reset()
 
     def reset(self):
-        self.board = np.full((self.size, self.size), constants.EMPTY)
+        # One bit mask per player. Bit n is set when the player has a symbol on move n.
+        self.cross_mask = 0
+        self.nought_mask = 0
 
-    def play(self, player, move):
-        # Split index components into x & y
-        x, y = move // self.size, move % self.size
+        # Bit n is set while move n is still available
+        self.empty_mask = self.geometry.full_mask
+
+        # Cached tuple of valid moves, cleared whenever the board changes
+        self.valid_moves = None
+
+        # Zobrist key of the position under each board symmetry, updated as moves are played & undone
+        self.symmetry_keys = [0] * len(self.geometry.permutations)
+
+        # Cached (identifier, transform) of the canonical position, cleared whenever the board changes
+        self.canonical = None
+
+        # Number of each player's symbols in every window, packed into one integer per player as geometry describes
+        self.cross_window_counts = 0
+        self.nought_window_counts = 0
+
+        # Moves played on the board, most recent last
+        self.moves = []
+
+    def clone(self):
+        # Copy the game state only. Configuration, geometry & players are shared with this board.
+        board = copy.copy(self)
+        board.symmetry_keys = list(self.symmetry_keys)
+        board.moves = list(self.moves)
+
+        return board
+
+    @property
+    def board(self):
+        # Build a (rows, columns) array of symbols from the player masks
+        board = np.full(self.squares, constants.EMPTY)
+
+        for move in iterate_bits(self.cross_mask):
+            board[move] = constants.CROSS
+        for move in iterate_bits(self.nought_mask):
+            board[move] = constants.NOUGHT
+
+        return board.reshape((self.rows, self.columns))
+
+    @board.setter
+    def board(self, board):
+        # Rebuild the player masks from a (rows, columns) array of symbols
+        self.reset()
+
+        for move, symbol in enumerate(np.asarray(board).flatten()):
+            if symbol != constants.EMPTY:
+                self.place(symbol, move)
+                self.moves.append(move)
+
+    def place(self, symbol, move):
+        # Set board symbol in the player's mask, add the square's keys to every symmetric key & count the symbol in
+        # every window through the square
+        if symbol == constants.CROSS:
+            self.cross_mask |= 1 << move
+            self.symmetry_keys = list(map(operator.add, self.symmetry_keys, self.geometry.cross_keys[move]))
+            self.cross_window_counts += self.geometry.window_units[move]
+        else:
+            self.nought_mask |= 1 << move
+            self.symmetry_keys = list(map(operator.add, self.symmetry_keys, self.geometry.nought_keys[move]))
+            self.nought_window_counts += self.geometry.window_units[move]
+
+        self.empty_mask ^= 1 << move
+        self.canonical = None
+        self.valid_moves = None
 
+    def get_mask(self, symbol):
+        return self.cross_mask if symbol == constants.CROSS else self.nought_mask
+
+    def play(self, player, move):
         # If there is already a piece in this place, throw an error.
-        if self.board[x, y] != constants.EMPTY:
+        if not self.empty_mask >> move & 1:
             raise IndexError("Invalid board move passed. Attempted move: {}".format(move))
 
-        # Set board symbol in internal array
-        self.board[x, y] = player.symbol
+        self.place(player.symbol, move)
+        self.moves.append(move)
 
         # Initialise return parameters
         game_winner = None
         game_end = False
         
         # Check if this move has resulted in a win
-        if self.check_win(x, y, player):
+        if self.is_winning_move(move, player.symbol):
             game_end = True
             game_winner = player
-        # Check whether the board is now full, if so, the game is a draw.
-        elif self.is_full():
+        # Check whether the board is now full, or no window can be completed, if so, the game is a draw.
+        elif self.is_full() or self.is_dead_draw():
             game_end = True
             game_winner = constants.DRAW
 
         # Return whether the game has ended and the winner.
         return game_end, game_winner
 
+    def make_move(self, move):
+        # Play a move for whoever's turn it is
+        return self.play(self.get_current_player(), move)
+
+    def unmake_move(self):
+        # Undo the most recently played move
+        move = self.moves[-1]
+        self.set_empty(move)
+
+        return move
+
     def set_empty(self, move):
-        # Split index components into x & y
-        x, y = move // self.size, move % self.size
+        bit = 1 << move
+
+        # Clear the square from the player's mask, remove its keys from every symmetric key & stop counting the symbol
+        # in every window through the square
+        if self.cross_mask & bit:
+            self.cross_mask ^= bit
+            self.symmetry_keys = list(map(operator.sub, self.symmetry_keys, self.geometry.cross_keys[move]))
+            self.cross_window_counts -= self.geometry.window_units[move]
+        elif self.nought_mask & bit:
+            self.nought_mask ^= bit
+            self.symmetry_keys = list(map(operator.sub, self.symmetry_keys, self.geometry.nought_keys[move]))
+            self.nought_window_counts -= self.geometry.window_units[move]
+        else:
+            return
+
+        # Moves are usually undone in reverse order, but searches may clear any square
+        if self.moves[-1] == move:
+            self.moves.pop()
+        else:
+            self.moves.remove(move)
 
-        self.board[x, y] = constants.EMPTY
+        self.empty_mask |= bit
+        self.canonical = None
+        self.valid_moves = None
 
     def check_win(self, x, y, player):
-        # Check for win
-
-        def check_consecutive(piece_list):
-            # Converts 0, 2, 2, 1, 2, 2, 2
-            # Into
-            # (0, 1), (2, 2), (1, 1), (2, 3)
-            # (Symbol, Amount)
-            grouped_list = [(k, sum(1 for i in g)) for k, g in itertools.groupby(piece_list)]
-
-            for consecutive_tuple in grouped_list:
-                if consecutive_tuple[0] == player.symbol and consecutive_tuple[1] >= self.symbols_needed:
-                    return True
-
-        # Check row
-        row_list = list(self.board[x, :])
-        if check_consecutive(row_list):
-            return True
-
-        # Check vertical
-        column_list = list(self.board[:, y])
-        if check_consecutive(column_list):
-            return True
-
-        # Check diagonals
-        # Check left to right
-        diagonal = list(np.diag(self.board, y - x))
-        # indices = list(np.diag_indices(self.board, y-x))
-        if check_consecutive(diagonal):
-            return True
-
-        # Flip the board as we can only check left to right
-        board_flip = np.flip(self.board, 1)
-
-        # Also calculate board_index for new board
-        # The row remains the same, however the column is now board_size - current column - 1
-        y = self.size - 1 - y
-
-        diagonal = list(np.diag(board_flip, y - x))
-        if check_consecutive(diagonal):
-            return True
+        return self.is_winning_move(x * self.columns + y, player.symbol)
+
+    def is_winning_move(self, move, symbol):
+        # Only a line through the last move can have been completed by it, so walk outwards from the move in each
+        # direction, counting the player's symbols until the run is broken or long enough to win.
+        mask = self.get_mask(symbol)
+        symbols_needed = self.symbols_needed
+
+        for forward, backward in self.geometry.rays[move]:
+            count = 1
+
+            for bit in forward:
+                if not mask & bit:
+                    break
+                count += 1
+
+            for bit in backward:
+                if not mask & bit:
+                    break
+                count += 1
+
+            if count >= symbols_needed:
+                return True
 
         return False
 
     def is_full(self):
-        return constants.EMPTY not in self.board
+        return not self.empty_mask
+
+    def is_dead_draw(self):
+        # Neither player can complete a window, so the game will be a draw however it is played out
+        if len(self.moves) < self.geometry.dead_draw_ply:
+            return False
+
+        # Every window holds a symbol of each player once both players' counts are nonzero in every field
+        window_ones = self.geometry.window_ones
+
+        return self.get_occupied_windows(self.cross_window_counts) == window_ones and \
+            self.get_occupied_windows(self.nought_window_counts) == window_ones
+
+    def get_occupied_windows(self, window_counts):
+        # Packed counts with a 1 in the lowest bit of every nonzero field
+        occupied = window_counts
+        for bit in range(1, self.geometry.window_field_bits):
+            occupied |= window_counts >> bit
+
+        return occupied & self.geometry.window_ones
 
     def is_empty(self):
-        return len(self.get_valid_moves()) == (self.squares)
+        return self.empty_mask == self.geometry.full_mask
 
     def symbol_formatter(self, symbol):
         if symbol == constants.EMPTY:
@@ -129,12 +235,12 @@ class Board:
     def display(self):
         # Form rows of formatting {}s connected by |
         rows = []
-        for i in range(self.size):
-            row = [" {} "] * self.size
+        for i in range(self.rows):
+            row = [" {} "] * self.columns
             rows.append("|".join(row) + "\n")
 
         # Add in-between lines
-        board = (("----" * self.size) + "\n").join(rows)
+        board = (("----" * self.columns) + "\n").join(rows)
 
         # Convert CROSS to X etc.
         board_symbols = (self.symbol_formatter(symbol) for symbol in list(self.board.flatten()))
@@ -142,144 +248,93 @@ class Board:
         # Print the string with the symbols then formatted
         print(board.format(*board_symbols))
 
+    def get_canonical(self):
+        # The canonical position is the symmetry with the smallest key. Ties go to the first symmetry tried.
+        if self.canonical is None:
+            identifier = min(self.symmetry_keys)
+            self.canonical = identifier, self.symmetry_keys.index(identifier)
+
+        return self.canonical
+
     def get_identifier(self, return_details = False):
-        # Calculate the SUM_X/SUM_Y for board and return in tuple form
-        # Rotate board 4 times and find minimum value for state
-        # Implementation of Sebestian Siegel's "ECE 539 Term Project" algorithm
-
-        # State board information
-        sum_x = inf
-        sum_o = inf
-        board_flip = 0
-        board_rotate = 0
-        best_board = None
-
-        # Consider unflipped & flipped
-        for flip in range(2):
-            # Clone board so that we do not modify object's board
-            board_copy = copy.copy(self.board)
-
-            # On second iteration of loop, flip the board
-            if flip == 1:
-                board_copy = np.flip(board_copy, 0)
-
-            # Consider 4 rotations
-            for rotation in range(0, 4):
-                # Board information
-                board_sum_x = 0
-                board_sum_o = 0
-
-                # Whether we should change state board variables
-                set_board = False
-
-                # Determine sum_x & sum_o
-                for index, value in enumerate(board_copy.flatten()):
-                    if value == 1:
-                        board_sum_x += 0.5 ** (index + 1)
-                    elif value == -1:
-                        board_sum_o += 0.5 ** (index + 1)
-
-                # Check whether the sum for this board is lower than the previous smallest sum
-                if board_sum_x < sum_x:
-                    set_board = True
-                elif sum_x == board_sum_x:
-                    # Sum X and temp are the same, check O values
-                    if board_sum_o < sum_o:
-                        set_board = True
-
-                if set_board:
-                    # This board is the new reference
-                    sum_x = board_sum_x
-                    sum_o = board_sum_o
-                    board_rotate = rotation
-                    board_flip = flip
-                    best_board = copy.copy(board_copy)
-
-                # Rotate board
-                board_copy = np.rot90(board_copy)
+        # Find the minimum key of the board's rotations & reflections, so that symmetric boards share one state
+        # Based on Sebestian Siegel's "ECE 539 Term Project" algorithm, using exact integer keys kept up to date by
+        # play & set_empty rather than recomputing float sums for every symmetry.
+        identifier, transform = self.get_canonical()
 
         # Determine whether to return all state information or just the ID
         if return_details:
-            state_board = Board(self.configuration)
-            state_board.board = best_board
-
-            return (sum_x, sum_o), state_board, board_rotate, board_flip
+            permutation = self.geometry.permutations[transform]
+            board_rotate, board_flip = self.geometry.transforms[transform]
+
+            state_board = self.clone()
+            state_board.reset()
+            for move in iterate_bits(self.cross_mask):
+                state_board.place(constants.CROSS, permutation[move])
+            for move in iterate_bits(self.nought_mask):
+                state_board.place(constants.NOUGHT, permutation[move])
+            state_board.moves = [permutation[move] for move in self.moves]
+
+            return identifier, state_board, board_rotate, board_flip
         else:
-            return (sum_x, sum_o)
-        
-    def get_current_player(self):
-        # If it's X's turn, there will be the same amount of Xs as Os
+            return identifier
 
-        x_count, o_count = 0, 0
-        for symbol in list(self.board.flatten()):
-            if symbol == constants.CROSS:
-                x_count += 1
-            elif symbol == constants.NOUGHT:
-                o_count += 1
+    def load_identifier(self, identifier):
+        # Brain data saved before identifiers were integers uses (sum_x, sum_o) float tuples, where square n adds
+        # 0.5 ** (n + 1). Scaling each sum by 2 ** squares gives the cross & nought halves of the integer identifier.
+        if isinstance(identifier, tuple):
+            sum_x, sum_o = identifier
+            return int(sum_x * 2 ** self.squares) << self.squares | int(sum_o * 2 ** self.squares)
 
-        return self.player_x if o_count == x_count else self.player_o
+        return identifier
+
+    def get_current_player(self):
+        # X always plays first, so it's X's turn after an even number of moves
+        return self.player_x if len(self.moves) % 2 == 0 else self.player_o
 
     def get_inactive_player(self):
-        return self.player_x if self.get_current_player() == self.player_o else self.player_o
+        return self.player_o if len(self.moves) % 2 == 0 else self.player_x
+
+    def get_ply(self):
+        # Number of moves that have been played
+        return len(self.moves)
     
     def get_valid_moves(self):
-        # Return moves that do not contain a player
-        return list(index for index, symbol in enumerate(list(self.board.flatten())) if symbol == constants.EMPTY)
+        # Return moves that do not contain a player. Callers get their own list as they often modify it.
+        if self.valid_moves is None:
+            self.valid_moves = tuple(iterate_bits(self.empty_mask))
+
+        return list(self.valid_moves)
+
+    def get_distinct_moves(self):
+        # Return one move from each group of moves that lead to symmetric positions. Symmetries that leave the board
+        # unchanged (whose key matches the untransformed key) map each move onto moves with the same outcome, so only
+        # the smallest move of each group is kept.
+        stabilizer = [permutation for permutation, key in zip(self.geometry.permutations, self.symmetry_keys)
+                      if key == self.symmetry_keys[0]]
+
+        # Most positions past the first few moves have no symmetry but the identity
+        if len(stabilizer) == 1:
+            return self.get_valid_moves()
+
+        return [move for move in self.get_valid_moves() if all(move <= permutation[move] for permutation in stabilizer)]
 
     def get_invalid_moves(self):
         # Return moves that already contain a player
-        return list(index for index, symbol in enumerate(list(self.board.flatten())) if symbol != constants.EMPTY)
+        return list(iterate_bits(self.cross_mask | self.nought_mask))
 
     def board_move_to_state(self, move):
         # Check if valid move is passed
         if move < 0:
             raise Exception("Invalid board move passed: {}".format(move))
 
-        moves = [0] * self.squares
-
-        # Action 2 does not mean move 2 for our state board
-        board_identifier, state_board, board_rotate, board_flip = self.get_identifier(return_details=True)
-
-        # In our temporary array, set our move to be converted to 1. We will then later get the index of this 1 to
-        # return our new move.
-        moves[move] = 1
-        moves = np.array(moves)
-        moves.resize((self.size, self.size))
-
-        # Flip board if needed
-        if board_flip:
-            moves = np.flip(moves, 0)
-
-        # Rotate however many times required
-        moves = np.rot90(moves, board_rotate)
-
-        # Convert moves back into a list then return index of the 1
-        moves = list(moves.flatten())
-        return moves.index(1)
+        # Action 2 does not mean move 2 for our state board, so map it through the canonical symmetry
+        return self.geometry.permutations[self.get_canonical()[1]][move]
 
     def state_move_to_board(self, move):
         # Check if valid move is passed
         if move < 0:
             raise Exception("Invalid state move passed: {}".format(move))
 
-        moves = [0] * self.squares
-
-        # State move 2 does not mean move 2 for our current board
-        board_identifier, state_board, board_rotate, board_flip = self.get_identifier(return_details=True)
-
-        # In our temporary array, set our move to be converted to 1. We will then later get the index of this 1 to
-        # return our new move.
-        moves[move] = 1
-        moves = np.array(moves)
-        moves.resize((self.size, self.size))
-
-        # Rotate the board in the other direction (as we're doing the inverse of the board -> state moves)
-        moves = np.rot90(moves, -board_rotate)
-
-        # Flip board if needed after rotations (as we're doing the inverse of the board -> state moves)
-        if board_flip:
-            moves = np.flip(moves, 0)
-
-        # Convert moves back into a list then return index of the 1
-        moves = list(moves.flatten())
-        return moves.index(1)
+        # State move 2 does not mean move 2 for our current board, so map it through the inverse symmetry
+        return self.geometry.inverse_permutations[self.get_canonical()[1]][move]
@@ -0,0 +1,91 @@
+import numpy as np
+
+import constants
+from geometry import get_dimensions, get_geometry
+
+
+# Many games of the same configuration stored in one (games, squares) array, so that a move can be played in every game
+# at once and wins & draws are found with array operations rather than a Board per game.
+class BoardBatch:
+
+    def __init__(self, configuration, games):
+        self.configuration = configuration
+        self.rows, self.columns = get_dimensions(configuration)
+        self.squares = configuration["squares"]
+        self.symbols_needed = configuration["symbols_needed"]
+
+        self.geometry = get_geometry(configuration)
+        self.games = games
+
+        # Reset all games
+        self.boards = np.full((self.games, self.squares), constants.EMPTY, dtype=np.int8)
+        self.ply = np.zeros(self.games, dtype=np.int64)
+
+    @property
+    def board(self):
+        # View of the games as (games, rows, columns) boards
+        return self.boards.reshape((self.games, self.rows, self.columns))
+
+    def load_board(self, board):
+        # Set every game to the position on a Board, e.g. to run many playouts from it at once
+        self.boards[:] = board.board.flatten()
+        self.ply[:] = board.get_ply()
+
+    def reset(self, games=None):
+        # Reset every game, or only the selected games (a boolean mask such as game_end from play, or indexes)
+        if games is None:
+            games = slice(None)
+
+        self.boards[games] = constants.EMPTY
+        self.ply[games] = 0
+
+    def get_current_symbols(self):
+        # X always plays first, so it's X's turn after an even number of moves
+        return np.where(self.ply % 2 == 0, constants.CROSS, constants.NOUGHT).astype(np.int8)
+
+    def get_valid_moves(self):
+        # (games, squares) mask of the moves that do not contain a player
+        return self.boards == constants.EMPTY
+
+    def get_random_moves(self):
+        # Pick a random valid move for every game. Full boards get move 0, but finished games should be reset first.
+        random_values = np.random.random((self.games, self.squares))
+        random_values[~self.get_valid_moves()] = -1
+
+        return np.argmax(random_values, axis=1)
+
+    def play(self, moves, games=None):
+        # Play one move in every selected game (all games by default) for whoever's turn it is in that game
+        indexes = np.arange(self.games) if games is None else np.flatnonzero(games)
+        moves = np.asarray(moves)[indexes]
+
+        # If there is already a piece in any of these places, throw an error.
+        if np.any(self.boards[indexes, moves] != constants.EMPTY):
+            raise IndexError("Invalid board moves passed. Attempted moves: {}".format(moves))
+
+        symbols = self.get_current_symbols()[indexes]
+        self.boards[indexes, moves] = symbols
+        self.ply[indexes] += 1
+
+        # Sum each window. A window summing to k * symbol has been filled by the player who just moved.
+        window_symbols = self.boards[indexes][:, self.geometry.window_indexes]
+        window_sums = window_symbols.sum(axis=2)
+        won = np.any(window_sums == self.symbols_needed * symbols[:, np.newaxis].astype(np.int64), axis=1)
+
+        # Windows holding both symbols can no longer be completed by either player
+        blocked = np.any(window_symbols == constants.CROSS, axis=2) & np.any(window_symbols == constants.NOUGHT, axis=2)
+        dead = np.all(blocked, axis=1)
+
+        # Games that did not end in a win are a draw once the board is full, or once no window can be completed
+        drawn = ~won & ((self.ply[indexes] == self.squares) | dead)
+
+        # Initialise return parameters. Games that were not played have not ended.
+        game_end = np.zeros(self.games, dtype=bool)
+        game_winners = np.full(self.games, constants.EMPTY, dtype=np.int8)
+
+        # Winner is the player's symbol for a win, DRAW for a draw and EMPTY if the game is still going
+        game_end[indexes] = won | drawn
+        game_winners[indexes] = np.where(won, symbols, np.where(drawn, constants.DRAW, constants.EMPTY))
+
+        # Return which games have ended and their winners.
+        return game_end, game_winners
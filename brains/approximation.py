@@ -0,0 +1,188 @@
+import os
+import random
+import time
+
+import numpy as np
+
+import constants
+from brains.brain import Brain
+
+
+# Q-Learning with a small neural network in place of the Q-Table. A move is valued by the position it leads to, which is
+# described by how many k-in-a-row windows hold only our symbols or only the opponent's, counted by how full they are.
+# The network's size depends only on k, so it stays the same for any board size, and every valid move is valued with one
+# batch of matrix multiplications.
+class Brain_Approximation(Brain):
+
+    def __init__(self, player, opp_player, board):
+        super().__init__()
+        self.player = player
+        self.opp_player = opp_player
+        self.board = board
+
+        self.name = "Approximation"
+
+        # Initialise learning values
+        self.learning_rate = constants.APPROX_LEARNING_RATE
+        self.epsilon = constants.APPROX_EPSILON
+        self.gamma = constants.APPROX_GAMMA
+        self.batch_size = constants.APPROX_BATCH_SIZE
+
+        # A move changes at most this many windows, so features are scaled by it to keep a move's effect near 1
+        self.feature_scale = 1 / max(self.board.geometry.window_counts)
+
+        # Windows holding 1 to k of our symbols & none of the opponent's, then the same for the opponent
+        self.features = 2 * self.board.symbols_needed
+
+        # One hidden layer of tanh units, & a tanh output so values lie within the rewards' range of -1 to 1
+        self.weights_hidden = np.random.normal(0, 1 / np.sqrt(self.features),
+                                               (self.features, constants.APPROX_HIDDEN_UNITS))
+        self.bias_hidden = np.zeros(constants.APPROX_HIDDEN_UNITS)
+        self.weights_output = np.random.normal(0, 1 / np.sqrt(constants.APPROX_HIDDEN_UNITS),
+                                               constants.APPROX_HIDDEN_UNITS)
+        self.bias_output = 0.0
+
+        # Features & target values waiting to be learned from in the next batch
+        self.batch_features = []
+        self.batch_targets = []
+
+        self.data_file = os.path.join(self.board.brain_data_folder,
+                                      "approximation_{}.npz".format(self.player.symbol_string))
+
+        self.reset()
+
+    def reset(self):
+        # Features of the position our last move led to
+        self.last_features = None
+
+        # Identifier, valid moves, features & values of the last position looked up
+        self.state = None
+
+    def get_move(self):
+        moves, features, values = self.get_state()
+
+        # Check whether we want to explore or exploit
+        if random.random() < self.epsilon:
+            # Explore, pick random move
+            index = random.randrange(len(moves))
+        else:
+            # Exploit, pick randomly between the moves with the highest value
+            best_moves = np.flatnonzero(values == values.max())
+            index = best_moves[random.randrange(len(best_moves))]
+
+        board_action = moves[index]
+
+        # Store the position our move leads to so we can learn its value later on
+        self.last_features = features[index]
+
+        return board_action, self.board.board_move_to_state(board_action)
+
+    def update_q_value(self, reward, game_end=False):
+        if self.last_features is None:
+            return
+
+        # Finished games are worth their reward. Otherwise our last move is worth our best move from here.
+        if game_end:
+            target = reward
+        else:
+            _, _, values = self.get_state()
+            target = reward + self.gamma * values.max()
+
+        self.batch_features.append(self.last_features)
+        self.batch_targets.append(target)
+
+        if len(self.batch_targets) == self.batch_size:
+            self.train_batch()
+
+    def get_state(self):
+        # Return the valid moves, the features of the position each leads to & their values. The state updated after
+        # the opponent's move is the one our next move is picked from, so each is only found once per state.
+        board_identifier = self.board.get_identifier()
+
+        if self.state is None or self.state[0] != board_identifier:
+            moves = self.board.get_valid_moves()
+            features = self.get_move_features(moves)
+            values = self.forward(features)[1]
+
+            # Winning moves are worth the full reward, whatever the network thinks
+            values[features[:, self.board.symbols_needed - 1] > 0] = constants.Q_REWARD
+
+            self.state = board_identifier, moves, features, values
+
+        return self.state[1:]
+
+    def get_move_features(self, moves):
+        # (moves, features) array describing the position after each move, from our point of view
+        board = self.board.board.flatten() * self.player.symbol
+        boards = np.repeat(board[np.newaxis], len(moves), axis=0)
+        boards[np.arange(len(moves)), moves] = 1
+
+        window_symbols = boards[:, self.board.geometry.window_indexes]
+        own_counts = (window_symbols == 1).sum(axis=2)
+        opp_counts = (window_symbols == -1).sum(axis=2)
+
+        features = np.zeros((len(moves), self.features))
+
+        for count in range(1, self.board.symbols_needed + 1):
+            features[:, count - 1] = ((own_counts == count) & (opp_counts == 0)).sum(axis=1)
+            features[:, self.board.symbols_needed + count - 1] = ((opp_counts == count) & (own_counts == 0)).sum(axis=1)
+
+        return features * self.feature_scale
+
+    def forward(self, features):
+        # Return the hidden layer's activations & the value of each row of features
+        hidden = np.tanh(features @ self.weights_hidden + self.bias_hidden)
+
+        return hidden, np.tanh(hidden @ self.weights_output + self.bias_output)
+
+    def train_batch(self):
+        # One step of gradient descent on the squared error between the batch's values & their targets
+        features = np.array(self.batch_features)
+        targets = np.array(self.batch_targets)
+
+        hidden, values = self.forward(features)
+
+        output_errors = (values - targets) * (1 - values ** 2) / len(targets)
+        hidden_errors = np.outer(output_errors, self.weights_output) * (1 - hidden ** 2)
+
+        self.weights_output -= self.learning_rate * (hidden.T @ output_errors)
+        self.bias_output -= self.learning_rate * output_errors.sum()
+        self.weights_hidden -= self.learning_rate * (features.T @ hidden_errors)
+        self.bias_hidden -= self.learning_rate * hidden_errors.sum(axis=0)
+
+        self.batch_features = []
+        self.batch_targets = []
+
+        # Values found with the old weights are out of date
+        self.state = None
+
+    def save(self):
+        time_before = time.time()
+
+        print("Saving network weights for {}.".format(self.player.name))
+
+        self.create_data_folder(self.data_file)
+
+        np.savez(self.data_file, weights_hidden=self.weights_hidden, bias_hidden=self.bias_hidden,
+                 weights_output=self.weights_output, bias_output=self.bias_output)
+
+        print("Saved {}'s network weights to {}. {:.1f}s taken to save.".format(self.player.name, self.data_file,
+                                                                             time.time() - time_before))
+
+    def load(self):
+        print("Loading network weights for {}.".format(self.player.name))
+
+        try:
+            data = np.load(self.data_file)
+        except FileNotFoundError:
+            print("No network weights found for {}.".format(self.player.name))
+            return
+
+        self.weights_hidden = data["weights_hidden"]
+        self.bias_hidden = data["bias_hidden"]
+        self.weights_output = data["weights_output"]
+        self.bias_output = float(data["bias_output"])
+
+        self.state = None
+
+        print("Successfully loaded network weights for {}.".format(self.player.name))
@@ -1,3 +1,6 @@
+import os
+
+
 class Brain:
 
     def __init__(self):
@@ -14,3 +17,13 @@ class Brain:
 
     def load(self):
         pass
+
+    def close(self):
+        pass
+
+    def create_data_folder(self, data_file):
+        # Brain folders are only created when there is data to save in them
+        folder = os.path.dirname(data_file)
+        if not os.path.exists(folder):
+            print("No save folder found at {}. Creating folder now.".format(folder))
+            os.makedirs(folder)
@@ -3,8 +3,9 @@ import random
 import numpy as np
 
 import constants
-from board import Board
+from board import iterate_bits
 from brains.brain import Brain
+from brains.threatspace import find_forced_win, get_window_squares
 
 
 class Brain_MonteCarlo(Brain):
@@ -67,15 +68,31 @@ class Node:
 
         self.move_played = move
 
-        self.unexplored_moves = board.get_valid_moves()
+        # Moves to symmetric positions are equivalent, so only one of each is explored
+        self.unexplored_moves = board.get_distinct_moves()
+
+        # Only expand moves that matter: a win through threats, or blocking the opponent's immediate win
+        if constants.MCTS_THREAT_GUARD and not terminal:
+            forced_move = find_forced_win(board)
+
+            if forced_move != -1:
+                self.unexplored_moves = [forced_move]
+            else:
+                opp_winning_squares = get_window_squares(board, board.get_inactive_player().symbol, 1)
+                if opp_winning_squares:
+                    self.unexplored_moves = list(iterate_bits(opp_winning_squares))
 
     def best_child(self, c=1.41):
         ucb_values = []
 
+        # The players are the same for every child
+        current_player = self.board.get_current_player()
+        inactive_player = self.board.get_inactive_player()
+
         for node in self.children:
             # Get wins for this child node
-            wins = node.results.get_wins(self.board.get_current_player())
-            losses = node.results.get_wins(self.board.get_inactive_player())
+            wins = node.results.get_wins(current_player)
+            losses = node.results.get_wins(inactive_player)
 
             # Calculate win-rate
             node_value = (wins - losses) / node.visit_count
@@ -99,13 +116,10 @@ class Node:
 
     def expand(self):
         # Return one of our unexplored moves
-        new_board = Board(self.board.configuration)
-        new_board.player_x = self.board.player_x
-        new_board.player_o = self.board.player_o
-        new_board.board = self.board.board.copy()
+        new_board = self.board.clone()
 
         board_move = self.unexplored_moves.pop()
-        game_end, game_winner = new_board.play(new_board.get_current_player(), board_move)
+        game_end, game_winner = new_board.make_move(board_move)
 
         # Create new node
         node = Node(self.brain, new_board, board_move, game_end, game_winner, self)
@@ -118,21 +132,44 @@ class Node:
         if self.terminal:
             return self.terminal, self.winner
 
-        # Record moves so we can undo them
-        moves = []
+        # Record how many moves we play so we can undo them
+        moves_played = 0
 
         # Play the rest of the game out from this board state
         game_end = False
 
-        # Random playout
+        # Random playout, except that immediate wins are always taken & the opponent's immediate wins always blocked.
+        # Once both players have made a playout move, each has taken any win it had & blocked any the other had, so new
+        # wins can only be in windows through the last move of each.
+        windows_through = self.board.geometry.windows_through
+        player_windows = opp_windows = None
+
         while not game_end:
-            board_move = random.choice(self.board.get_valid_moves())
-            moves.append(board_move)
-            game_end, game_winner = self.board.play(self.board.get_current_player(), board_move)
+            move = -1
+
+            if constants.MCTS_THREAT_GUARD:
+                if moves_played >= 2:
+                    player_windows = windows_through[self.board.moves[-2]]
+                    opp_windows = windows_through[self.board.moves[-1]]
+
+                winning_squares = get_window_squares(self.board, self.board.get_current_player().symbol, 1,
+                                                     player_windows)
+                if not winning_squares:
+                    winning_squares = get_window_squares(self.board, self.board.get_inactive_player().symbol, 1,
+                                                         opp_windows)
+
+                if winning_squares:
+                    move = next(iterate_bits(winning_squares))
+
+            if move == -1:
+                move = random.choice(self.board.get_valid_moves())
+
+            game_end, game_winner = self.board.make_move(move)
+            moves_played += 1
 
         # Undo moves
-        for move in moves:
-            self.board.set_empty(move)
+        for _ in range(moves_played):
+            self.board.unmake_move()
 
         return game_end, game_winner
 
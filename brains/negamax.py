@@ -19,7 +19,7 @@ class Brain_Negamax(Brain):
         self.saved_scores = {}
 
     def get_move(self):
-        depth = len(self.board.get_invalid_moves())
+        depth = self.board.get_ply()
 
         # Pass in current player
         self.board_move = -1
@@ -30,23 +30,17 @@ class Brain_Negamax(Brain):
 
     # Player is the current player we are analysing
     def negamax(self, board, depth, player, last_played):
-        # Check for win/end of game
+        # Only the player who played last_played can have won, and only through that square
         if last_played is not None:
-            x, y = last_played // self.board.size, last_played % self.board.size
-
-            current_player_won = board.check_win(x, y, player)
-            inactive_player_won = board.check_win(x, y, self.opp_player if player == self.player else self.player)
+            inactive_player = self.opp_player if player == self.player else self.player
+            inactive_player_won = board.is_winning_move(last_played, inactive_player.symbol)
         else:
-            current_player_won = False
             inactive_player_won = False
 
-        # Check if node is terminal
-        if depth == self.board.squares or current_player_won or inactive_player_won:
-            # If our current player won, we need our score to be positive.
-            if current_player_won:
-                return (self.board.squares + 1) - depth
-            # Otherwise, give a negative score.
-            elif inactive_player_won:
+        # Check if node is terminal. Games are drawn once no window can be completed, even with squares left.
+        if depth == self.board.squares or inactive_player_won or board.is_dead_draw():
+            # If the inactive player won, give a negative score.
+            if inactive_player_won:
                 return -(self.board.squares + 1) + depth
             else:
                 # It was a draw, return zero.
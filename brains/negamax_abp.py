@@ -1,9 +1,17 @@
+import multiprocessing
 import os
 import time
-import ujson as json
 from math import inf
 
+import constants
 from brains.brain import Brain
+from brains.solved_table import load_solved_table
+from brains.threatspace import find_forced_win
+from brains.transposition import get_shared_table
+
+
+class SearchTimeout(Exception):
+    pass
 
 
 class Brain_Negamax_ABP(Brain):
@@ -16,85 +24,326 @@ class Brain_Negamax_ABP(Brain):
 
         self.name = "Negamax with ABP"
 
-        # Initialise saved scores (result from minimax)
-        self.saved_scores = {}
+        # Initialise saved scores (result from minimax). Scores are relative to the player to move, so both players
+        # share one table for the board's configuration.
+        self.saved_scores = get_shared_table(self.board.configuration)
         self.board_move = -1
 
-        self.data_file = os.path.join(self.board.brain_data_folder,
-                                      "abp_moves_{}.json".format(self.player.symbol_string))
+        # Exact scores & best moves for every position, if solver.py has solved the board's configuration
+        self.solved_table = None
+
+        self.data_file = os.path.join(self.board.brain_data_folder, "abp_moves.npz")
 
         self.profile = False
 
+        # Seconds to keep deepening the search for, and the deepest search to try (None to search to the game's end)
+        self.time_limit = constants.NEGAMAX_TIME_LIMIT
+        self.max_depth = None
+        self.deadline = inf
+
+        # How each iteration searches the root: a full window, principal variation search, aspiration windows around
+        # the last iteration's score or MTD(f)
+        self.search_drivers = {
+            "alphabeta": self.search_full_window,
+            "pvs": self.search_full_window,
+            "aspiration": self.search_aspiration,
+            "mtdf": self.search_mtdf
+        }
+        self.search_driver = constants.NEGAMAX_SEARCH_DRIVER
+
+        # Whether to look for wins through sequences of threats where the search stops
+        self.threat_search = constants.NEGAMAX_THREAT_SEARCH
+
+        # Number of processes to split root moves between. The pool is only started when first needed.
+        self.workers = constants.NEGAMAX_WORKERS
+        self.pool = None
+
+        # Nodes searched, and how many scores were estimated rather than searched to the end of the game
+        self.nodes = 0
+        self.estimates = 0
+
+        # Whether the last search ran out of time before finishing its deepest iteration
+        self.timed_out = False
+
+        # Nodes whose moves were searched, how many stopped early through a cutoff and how many of those cutoffs came
+        # from the first move tried. The first-move rate shows how well moves are ordered.
+        self.expanded = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+        # Move ordering data. Killer moves are the last 2 moves to cause a cutoff at each ply. The history table
+        # scores moves by how often, and how deep in the search, they have caused a cutoff.
+        self.killer_moves = []
+        self.history = []
+
     def get_move(self):
-        depth = len(self.board.get_invalid_moves())
+        # Solved positions need no search
+        if self.solved_table is not None:
+            solved = self.solved_table.probe(self.board.get_identifier())
 
-        self.board_move = -1
+            if solved is not None:
+                score, state_move = solved
+                return self.board.state_move_to_board(state_move), 0
+
+        if self.workers > 1:
+            best_move, score = self.search_parallel()
+        else:
+            best_move, score = self.search()
+
+        return best_move, 0
+
+    def search(self):
+        depth = self.board.get_ply()
+
+        self.deadline = time.time() + self.time_limit
+        self.nodes = 0
+        self.expanded = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.timed_out = False
+
+        self.killer_moves = [[-1, -1] for _ in range(self.board.squares + 1)]
+        self.history = [0] * self.board.squares
+
+        best_move = -1
+        score = 0
+
+        max_depth = self.board.squares - depth
+        if self.max_depth is not None:
+            max_depth = min(max_depth, self.max_depth)
+
+        # Search one move deeper each iteration. Every completed iteration leaves its best move ready and its scores in
+        # the saved scores, which the next iteration uses.
+        try:
+            for search_depth in range(1, max_depth + 1):
+                self.board_move = -1
+                self.estimates = 0
+
+                score = self.search_drivers[self.search_driver](depth, search_depth, score)
+
+                best_move = self.board_move
+
+                # Nothing was estimated, so the score is exact and searching deeper would not change it
+                if self.estimates == 0:
+                    break
+        except SearchTimeout:
+            self.timed_out = True
+
+            # Undo the moves of the unfinished iteration
+            while self.board.get_ply() > depth:
+                self.board.unmake_move()
+
+        # Fall back to any move if the first iteration did not finish
+        if best_move == -1:
+            best_move = self.board.get_valid_moves()[0]
+
+        if self.profile:
+            print("Nodes: {}, cutoff rate: {:.1%}, first move cutoffs: {:.1%}".format(
+                self.nodes, self.cutoffs / max(1, self.expanded), self.first_move_cutoffs / max(1, self.cutoffs)))
+
+        return best_move, score
+
+    def search_parallel(self):
+        # Imported here as the worker module needs every brain to have been loaded
+        from brains.parallel import search_root_move
+
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers)
+
+        # Moves to symmetric positions score the same, so only one of each is searched
+        moves = self.board.get_distinct_moves()
+
+        deadline = time.time() + self.time_limit
+        self.nodes = 0
+
+        # Fall back to any move if the first iteration does not finish
+        best_move = moves[0]
+        score = 0
+
+        max_depth = self.board.squares - self.board.get_ply()
+        if self.max_depth is not None:
+            max_depth = min(max_depth, self.max_depth)
+
+        # Deepen every root move together, so that scores compared against each other come from the same search depth.
+        # Each iteration searches the position after every move one move less deeply, and only counts once every move
+        # has finished before the deadline.
+        for search_depth in range(1, max_depth + 1):
+            results = self.pool.starmap(search_root_move, [(self.board.configuration, self.board.moves, move, deadline,
+                                                            search_depth - 1, self.search_driver) for move in moves])
+
+            self.nodes += sum(result[2] for result in results if result is not None)
+
+            if None in results:
+                break
+
+            scores = {move: move_score for move, move_score, nodes, exact in results}
+
+            # Workers finish in any order & keep their own saved scores, so ties go to the smallest state move. The
+            # best score matches the sequential search, but its move may be a different one of the tied moves.
+            best_move = max(moves, key=lambda move: (scores[move], -self.board.board_move_to_state(move)))
+            score = scores[best_move]
+
+            # Every score is exact, so searching deeper would not change them
+            if all(exact for move, move_score, nodes, exact in results):
+                break
+
+        if self.profile:
+            print("Nodes: {} across {} workers".format(self.nodes, self.workers))
+
+        return best_move, score
 
+    def close(self):
+        # Stop the worker processes, if they were started
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def search_full_window(self, depth, search_depth, guess):
         # Pass in current player
-        self.negamax(self.board, depth, self.player, None, -inf, inf)
+        return self.negamax(self.board, depth, self.player, None, -inf, inf, search_depth)
+
+    def search_aspiration(self, depth, search_depth, guess):
+        # Search a narrow window around the last iteration's score, widening a side to infinity whenever the score
+        # falls outside it. The first iteration has no score to start from.
+        if search_depth == 1:
+            return self.search_full_window(depth, search_depth, guess)
+
+        alpha = guess - constants.NEGAMAX_ASPIRATION_WINDOW
+        beta = guess + constants.NEGAMAX_ASPIRATION_WINDOW
+
+        while True:
+            score = self.negamax(self.board, depth, self.player, None, alpha, beta, search_depth)
+
+            if score <= alpha:
+                alpha = -inf
+            elif score >= beta:
+                beta = inf
+            else:
+                return score
+
+    def search_mtdf(self, depth, search_depth, guess):
+        # MTD(f) narrows bounds on the score with null window searches, starting from the last iteration's score.
+        # A search that fails high proves its best move scores at least the new lower bound, so the move from the
+        # last fail high is the best move once the bounds meet.
+        lower_bound = -inf
+        upper_bound = inf
+        score = guess
+        best_move = -1
+
+        while lower_bound < upper_bound:
+            beta = score + constants.NEGAMAX_NULL_WINDOW if score == lower_bound else score
+
+            score = self.negamax(self.board, depth, self.player, None, beta - constants.NEGAMAX_NULL_WINDOW, beta,
+                                 search_depth)
+
+            if score < beta:
+                upper_bound = score
+            else:
+                lower_bound = score
+                best_move = self.board_move
+
+        self.board_move = best_move
 
-        return self.board_move, 0
+        return score
 
     # Player is the current player we are analysing
-    def negamax(self, board, depth, player, last_played, alpha, beta):
+    def negamax(self, board, depth, player, last_played, alpha, beta, search_depth):
         alpha_original = alpha
+        estimates_original = self.estimates
 
-        board_identifier, state_board, board_rotate, board_flip = board.get_identifier(return_details=True)
+        # Stop searching once time is up. Leaves can be slow to score on large boards, so the clock is checked at every
+        # leaf, & every 1024 nodes otherwise.
+        self.nodes += 1
+        if (search_depth == 0 or self.nodes % 1024 == 0) and time.time() > self.deadline:
+            raise SearchTimeout()
+
+        board_identifier = board.get_identifier()
+
+        # Saved scores record how many moves were searched below the position. Searching every remaining move
+        # gives an exact result that is valid for any search depth.
+        moves_left = self.board.squares - depth
 
         # Check if we have a saved score for this node
-        entry = self.saved_scores.get(board_identifier, None)
+        entry = self.saved_scores.probe(board_identifier)
 
         # Check if score is valid
-        if entry is not None and entry["depth"] >= depth:
-            if entry["flag"] == "exact":
+        if entry is not None and entry[1] >= search_depth:
+            entry_score, entry_depth, entry_flag, entry_state_move = entry
+
+            # Results from a depth-limited search are themselves estimates
+            if entry_depth < moves_left:
+                self.estimates += 1
+
+            if entry_flag == constants.EXACT:
                 # Update board_move with entry's data
-                self.board_move = board.state_move_to_board(entry["state_move"])
+                self.board_move = board.state_move_to_board(entry_state_move)
 
-                return entry["score"]
-            elif entry["flag"] == "lowerbound":
-                alpha = max(alpha, entry["score"])
-            elif entry["flag"] == "upperbound":
-                beta = min(beta, entry["score"])
+                return entry_score
+            elif entry_flag == constants.LOWERBOUND:
+                alpha = max(alpha, entry_score)
+            elif entry_flag == constants.UPPERBOUND:
+                beta = min(beta, entry_score)
 
-            if alpha > beta:
+            if alpha >= beta:
                 # Update best_move with entry's data
-                self.board_move = board.state_move_to_board(entry["state_move"])
+                self.board_move = board.state_move_to_board(entry_state_move)
 
-                return entry["score"]
+                return entry_score
 
+        # Only the player who played last_played can have won, and only through that square
         if last_played is not None:
-            x, y = last_played // self.board.size, last_played % self.board.size
-
-            current_player_won = board.check_win(x, y, player)
-            inactive_player_won = board.check_win(x, y, self.opp_player if player == self.player else self.player)
+            inactive_player = self.opp_player if player == self.player else self.player
+            inactive_player_won = board.is_winning_move(last_played, inactive_player.symbol)
         else:
-            current_player_won = False
             inactive_player_won = False
 
-        # Check if node is terminal
-        if depth == self.board.squares or current_player_won or inactive_player_won:
-            # If our current player won, we need our score to be positive.
-            if current_player_won:
-                return (self.board.squares + 1) - depth
-            # Otherwise, give a negative score.
-            elif inactive_player_won:
+        # Check if node is terminal. Games are drawn once no window can be completed, even with squares left.
+        if depth == self.board.squares or inactive_player_won or board.is_dead_draw():
+            # If the inactive player won, give a negative score.
+            if inactive_player_won:
                 return -(self.board.squares + 1) + depth
             else:
                 # It was a draw, return zero.
                 return 0
 
+        # Estimate the score if we cannot search any deeper
+        if search_depth == 0:
+            self.estimates += 1
+
+            # Threat-space search finds forced wins far deeper than the search can see. Threat sequences prove a win,
+            # but not how soon, so it is scored as the slowest win possible.
+            if self.threat_search and find_forced_win(board) != -1:
+                return 1
+
+            return self.evaluate(board, player)
+
+        # Try the saved best move for this position first, even if its score could not be used
+        saved_move = board.state_move_to_board(entry[3]) if entry is not None else -1
+
+        self.expanded += 1
+
         # Store all moves and their scores
         scores = {}
 
-        # Iterate through each possible move
-        for index in board.get_valid_moves():
+        # Iterate through each possible move, most promising first
+        for index in self.order_moves(board, depth, saved_move):
             # Play move
             board.play(player, index)
 
             opp_player = self.opp_player if player == self.player else self.player
 
-            # Save score
-            scores[index] = -self.negamax(board, depth + 1, opp_player, index, -beta, -alpha)
+            if self.search_driver == "pvs" and scores:
+                # After the first move, check each move with a null window to prove it is no better than the best so
+                # far. Only moves that turn out better are searched again with the full window.
+                scores[index] = -self.negamax(board, depth + 1, opp_player, index,
+                                              -alpha - constants.NEGAMAX_NULL_WINDOW, -alpha, search_depth - 1)
+
+                if alpha < scores[index] < beta:
+                    scores[index] = -self.negamax(board, depth + 1, opp_player, index, -beta, -alpha,
+                                                  search_depth - 1)
+            else:
+                # Save score
+                scores[index] = -self.negamax(board, depth + 1, opp_player, index, -beta, -alpha, search_depth - 1)
 
             # Undo the move we previously added
             board.set_empty(index)
@@ -102,7 +351,19 @@ class Brain_Negamax_ABP(Brain):
             alpha = max(alpha, scores[index])
 
             # If we can achieve a better score else where in the game tree, stop evaluating this branch
-            if alpha > beta:
+            if alpha >= beta:
+                self.cutoffs += 1
+                if len(scores) == 1:
+                    self.first_move_cutoffs += 1
+
+                # Remember the move so it is tried early in similar positions
+                killers = self.killer_moves[depth]
+                if killers[0] != index:
+                    killers[1] = killers[0]
+                    killers[0] = index
+
+                self.history[index] += search_depth ** 2
+
                 break
 
         # Iterate through each of the scores and pick the maximum
@@ -115,53 +376,89 @@ class Brain_Negamax_ABP(Brain):
 
         # Store result
         if max_score <= alpha_original:
-            flag = "upperbound"
+            flag = constants.UPPERBOUND
         elif max_score >= beta:
-            flag = "lowerbound"
+            flag = constants.LOWERBOUND
         else:
-            flag = "exact"
+            flag = constants.EXACT
 
-        self.saved_scores[board_identifier] = {
-            "flag": flag,
-            "score": max_score,
-            "depth": depth,
-            "state_move": board.board_move_to_state(self.board_move)
-        }
+        # If nothing below this node was estimated, the result holds however deep later searches go
+        if self.estimates == estimates_original:
+            search_depth = moves_left
+
+        self.saved_scores.store(board_identifier, max_score, search_depth, flag,
+                                board.board_move_to_state(self.board_move))
 
         return max_score
 
+    def order_moves(self, board, depth, saved_move):
+        # Order moves by: the saved best move, killer moves for this ply, the history table, how many symbols
+        # surround the move and finally how many windows the move is part of.
+        killers = self.killer_moves[depth]
+        history = self.history
+        occupied = board.cross_mask | board.nought_mask
+        neighbours = board.geometry.neighbours
+        window_counts = board.geometry.window_counts
+
+        def move_order(move):
+            return (move == saved_move, move in killers, history[move], bin(occupied & neighbours[move]).count("1"),
+                    window_counts[move])
+
+        # Moves to symmetric positions score the same, so only one of each is searched
+        return sorted(board.get_distinct_moves(), key=move_order, reverse=True)
+
+    def evaluate(self, board, player):
+        # Estimate the score for player from the windows each player can still complete, weighting windows by how
+        # many symbols they already hold. Estimates stay within (-1, 1) so that any forced win or loss outranks them.
+        opp_player = self.opp_player if player == self.player else self.player
+
+        player_mask = board.get_mask(player.symbol)
+        opp_mask = board.get_mask(opp_player.symbol)
+
+        player_score = 0
+        opp_score = 0
+
+        for window in board.geometry.windows:
+            player_symbols = player_mask & window
+            opp_symbols = opp_mask & window
+
+            # Windows holding both symbols can no longer be completed by either player
+            if player_symbols and not opp_symbols:
+                player_score += 4 ** bin(player_symbols).count("1")
+            elif opp_symbols and not player_symbols:
+                opp_score += 4 ** bin(opp_symbols).count("1")
+
+        return (player_score - opp_score) / (player_score + opp_score + 1)
+
     def save(self):
         time_before = time.time()
 
-        print("Saving ABP data for {}.".format(self.player.name))
+        print("Saving ABP data.")
+
+        self.create_data_folder(self.data_file)
 
-        with open(self.data_file, "w") as file:
-            # Dump q_table to json file
-            json.dump({str(k): v for k, v in self.saved_scores.items()}, file)
+        # Save the used entries of the transposition table
+        self.saved_scores.save(self.data_file)
 
-        print("Saved {}'s ABP data to {}. {:.1f}s taken to save JSON file.".format(self.player.name, self.data_file,
-                                                                                   time.time() - time_before))
+        print("Saved ABP data to {}. {:.1f}s taken to save file.".format(self.data_file, time.time() - time_before))
 
     def load(self):
+        self.solved_table = load_solved_table(self.board)
+
+        # Both players share the saved scores, so they only need loading once
+        if self.saved_scores.loaded:
+            return
+
         time_before = time.time()
 
-        print("Loading ABP data for {}.".format(self.player.name))
+        print("Loading ABP data.")
 
-        try:
-            with open(self.data_file, "r") as file:
-                # Load ABP data from json file.
-                temp = json.load(file)
-        except FileNotFoundError:
-            print("No ABP data found for {}.".format(self.player.name))
-            return
+        self.saved_scores.loaded = True
 
-        # Save time taken to load file.
-        time_loaded = time.time()
+        if not os.path.exists(self.data_file):
+            print("No ABP data found at {}.".format(self.data_file))
+            return
 
-        # Convert string keys to tuples
-        self.saved_scores = {eval(k): v for k, v in temp.items()}
-        time_finished = time.time()
+        self.saved_scores.load(self.data_file)
 
-        print(
-            "Successfully loaded ABP data for {}. {:.1f}s taken to load JSON file. {:.1f}s taken to convert key tuples.".format(
-                self.player.name, time_loaded - time_before, time_finished - time_loaded))
+        print("Successfully loaded ABP data. {:.1f}s taken to load file.".format(time.time() - time_before))
@@ -0,0 +1,158 @@
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+import constants
+from board import Board
+from brains.negamax_abp import Brain_Negamax_ABP
+from brains.qlearning import Brain_QLearning, play_training_game
+from brains.threatspace import find_forced_win
+from geometry import get_configuration_key
+from player import Player
+
+# Board & brains of this worker process for each configuration. Brains keep their saved scores between searches.
+_worker_searches = {}
+
+# Board & Q-Learning brains of this worker process for each configuration
+_worker_trainings = {}
+
+
+def get_worker_search(configuration):
+    key = get_configuration_key(configuration)
+
+    if key not in _worker_searches:
+        board = Board(configuration)
+
+        player_x = Player(constants.CROSS, None)
+        player_o = Player(constants.NOUGHT, None)
+
+        board.player_x = player_x
+        board.player_o = player_o
+
+        player_x.brain = Brain_Negamax_ABP(player_x, player_o, board)
+        player_o.brain = Brain_Negamax_ABP(player_o, player_x, board)
+
+        _worker_searches[key] = board
+
+    return _worker_searches[key]
+
+
+def search_root_move(configuration, board_moves, move, deadline, max_depth, search_driver):
+    # Runs in a worker process. Scores a root move for the player making it by searching the position after it
+    # max_depth moves deep. Returns (move, score, nodes, exact), or None if the deadline passed first.
+    board = get_worker_search(configuration)
+
+    board.reset()
+    for board_move in board_moves:
+        board.make_move(board_move)
+
+    game_end, game_winner = board.make_move(move)
+
+    # Score finished games as the search would score them
+    if game_end:
+        return move, 0 if game_winner == constants.DRAW else board.squares + 1 - board.get_ply(), 1, True
+
+    if board.is_dead_draw():
+        return move, 0, 1, True
+
+    brain = board.get_current_player().brain
+
+    # The root search was only one move deep, so estimate the position as the search's leaves are
+    if max_depth == 0:
+        if brain.threat_search and find_forced_win(board) != -1:
+            return move, -1, 1, False
+
+        return move, -brain.evaluate(board, brain.player), 1, False
+
+    brain.time_limit = deadline - time.time()
+    brain.max_depth = max_depth
+    brain.search_driver = search_driver
+
+    if brain.time_limit <= 0:
+        return None
+
+    _, score = brain.search()
+
+    # Scores of unfinished iterations are not comparable with the other moves' scores
+    if brain.timed_out:
+        return None
+
+    return move, -score, brain.nodes, brain.estimates == 0
+
+
+def get_worker_training(configuration):
+    key = get_configuration_key(configuration)
+
+    if key not in _worker_trainings:
+        board = Board(configuration)
+
+        player_x = Player(constants.CROSS, None)
+        player_o = Player(constants.NOUGHT, None)
+
+        board.player_x = player_x
+        board.player_o = player_o
+
+        player_x.brain = Brain_QLearning(player_x, player_o, board)
+        player_o.brain = Brain_QLearning(player_o, player_x, board)
+
+        _worker_trainings[key] = board
+
+    return _worker_trainings[key]
+
+
+def play_training_games(configuration, tables, games, seed):
+    # Runs in a worker process. Plays self-play games from the given (identifiers, q_values) tables of X & O, and
+    # returns the rows of each table that the games changed or added.
+    board = get_worker_training(configuration)
+    brains = (board.player_x.brain, board.player_o.brain)
+
+    # Worker processes start with the same random state, so each round gets its own seed
+    random.seed(seed)
+
+    for brain, (identifiers, q_values) in zip(brains, tables):
+        brain.set_table(identifiers, q_values)
+
+    for _ in range(games):
+        play_training_game(board)
+
+    changed_tables = []
+
+    for brain, (identifiers, q_values) in zip(brains, tables):
+        new_identifiers, new_q_values = brain.get_table()
+
+        changed_rows = np.flatnonzero(np.any(new_q_values[:len(identifiers)] != q_values, axis=1))
+        rows = np.concatenate((changed_rows, np.arange(len(identifiers), len(new_identifiers))))
+
+        changed_tables.append(([new_identifiers[row] for row in rows], new_q_values[rows]))
+
+    return changed_tables
+
+
+def train_q_learning(board, games, workers, merge_games=None):
+    # Play self-play games for the board's players' Q-Learning brains in worker processes. Each round, every worker
+    # plays merge_games games from the current Q-Tables, then their changes are merged back into the brains.
+    if merge_games is None:
+        merge_games = constants.Q_MERGE_GAMES
+
+    brains = (board.player_x.brain, board.player_o.brain)
+    games_played = 0
+
+    with multiprocessing.Pool(workers) as pool:
+        while games_played < games:
+            # Split this round's games evenly between workers
+            round_games = min(workers * merge_games, games - games_played)
+            worker_games = [round_games // workers + (worker < round_games % workers) for worker in range(workers)]
+
+            tables = [brain.get_table() for brain in brains]
+
+            results = pool.starmap(play_training_games, [(board.configuration, tables, amount, random.getrandbits(32))
+                                                         for amount in worker_games if amount])
+
+            for index, brain in enumerate(brains):
+                brain.merge_tables([result[index] for result in results])
+
+            games_played += round_games
+
+            print("Training games completed: {} ({:.1f}%)".format(games_played, games_played * 100 / games))
@@ -0,0 +1,191 @@
+import constants
+from brains.brain import Brain
+
+# Proof & disproof number of a position that has been proven or disproven. Sums are capped here.
+PN_INFINITY = 10 ** 9
+
+
+# Depth-first proof-number search (df-pn). Rather than scoring moves, it tries to prove whether the player to move can
+# force a win, and otherwise whether they can force at least a draw.
+# Every position stores a proof number (how many positions must still be proven to show the player to move reaches the
+# goal) and a disproof number (how many to show they cannot). Search always follows the most-proving move, and stops
+# once the root is proven, disproven, or the node budget is used up.
+class Brain_ProofNumber(Brain):
+
+    def __init__(self, player, opp_player, board):
+        super().__init__()
+        self.player = player
+        self.opp_player = opp_player
+        self.board = board
+
+        self.name = "Proof-Number Search"
+
+        # Positions to search for each move, shared between the questions asked. Searches stop at the node limit.
+        self.node_budget = constants.PN_NODE_BUDGET
+        self.node_limit = 0
+        self.nodes = 0
+
+        # The question being asked: whether the attacker can force a win, or a draw if draws count for the attacker
+        self.attacker = None
+        self.draw_wins = False
+
+        # Proof & disproof numbers by (identifier, attacker, draw_wins). Kept between moves so later searches can reuse
+        # the work of earlier ones, up to PN_TABLE_SIZE positions.
+        self.proof_numbers = {}
+
+    def get_move(self):
+        self.prune_table()
+
+        # Play a proven win if there is one, otherwise a proven draw
+        self.nodes = 0
+
+        for draw_wins in (False, True):
+            if self.prove(self.player.symbol, draw_wins, self.get_question_limit(draw_wins)):
+                return self.get_proven_move(), 0
+
+        # Nothing could be proven within the budget, so play the move closest to proving a draw
+        return self.get_proven_move(), 0
+
+    def reset(self):
+        # Proven & disproven positions stay true, but unfinished estimates are only useful to the game they came from
+        self.proof_numbers = {key: numbers for key, numbers in self.proof_numbers.items() if 0 in numbers}
+
+    def prune_table(self):
+        # Keep the table within PN_TABLE_SIZE positions. Unfinished estimates are dropped first, & proven positions too
+        # if they alone fill it.
+        if len(self.proof_numbers) > constants.PN_TABLE_SIZE:
+            self.reset()
+
+        if len(self.proof_numbers) > constants.PN_TABLE_SIZE:
+            self.proof_numbers = {}
+
+    def get_question_limit(self, draw_wins):
+        # One node budget is shared by both questions. Proving a win may use up to half of it, & proving a draw whatever
+        # is left.
+        return self.node_budget if draw_wins else self.node_budget // 2
+
+    def get_result(self):
+        # Analyse the current position. Return 1, 0 or -1 if the player to move is proven to win, draw or lose, or None
+        # if the node budget ran out first.
+        symbol = self.board.get_current_player().symbol
+        self.nodes = 0
+
+        if self.prove(symbol, False, self.get_question_limit(False)):
+            return 1
+
+        win_disproven = self.proof_numbers[self.get_key()][1] == 0
+
+        if self.prove(symbol, True, self.get_question_limit(True)):
+            return 0 if win_disproven else None
+        elif self.proof_numbers[self.get_key()][1] == 0:
+            return -1
+
+        return None
+
+    def prove(self, attacker, draw_wins, node_limit):
+        # Return whether the attacker, who is to move, is proven to reach the goal before the node count reaches
+        # node_limit
+        self.attacker = attacker
+        self.draw_wins = draw_wins
+        self.node_limit = node_limit
+
+        proof, disproof = self.search(attacker, PN_INFINITY, PN_INFINITY)
+
+        return proof == 0
+
+    def get_proven_move(self):
+        # The move whose position is closest to being disproven for the opponent. A proven root has a move whose
+        # position is disproven. Ties go to the move in the most windows, the most central squares.
+        best_move = -1
+        best_numbers = None
+
+        for move in self.board.get_valid_moves():
+            self.board.make_move(move)
+            proof, disproof = self.proof_numbers.get(self.get_key(), (1, 1))
+            self.board.unmake_move()
+
+            numbers = (disproof, -proof, -self.board.geometry.window_counts[move])
+            if best_numbers is None or numbers < best_numbers:
+                best_move = move
+                best_numbers = numbers
+
+        return best_move
+
+    def get_key(self):
+        return self.board.get_identifier(), self.attacker, self.draw_wins
+
+    def get_terminal_numbers(self, symbol, game_winner):
+        # Numbers for a finished game where symbol would be next to move
+        if game_winner == constants.DRAW:
+            attacker_succeeded = self.draw_wins
+        else:
+            attacker_succeeded = game_winner.symbol == self.attacker
+
+        # The attacker's goal is proven at their own positions, and disproven at the defender's
+        if attacker_succeeded == (symbol == self.attacker):
+            return 0, PN_INFINITY
+        else:
+            return PN_INFINITY, 0
+
+    def search(self, symbol, proof_threshold, disproof_threshold):
+        # Search the position, where symbol is to move, until its proof number reaches proof_threshold or its disproof
+        # number reaches disproof_threshold. Numbers are relative to the player to move, so a position's proof number is
+        # the smallest disproof number of its moves, and its disproof number is the sum of their proof numbers.
+        self.nodes += 1
+
+        key = self.get_key()
+
+        numbers = self.proof_numbers.get(key)
+        if numbers is not None and (numbers[0] >= proof_threshold or numbers[1] >= disproof_threshold):
+            return numbers
+
+        # Store each move's position, scoring those that end the game straight away. Symmetric moves lead to the same
+        # position, so they are left out rather than counted twice.
+        children = []
+
+        for move in self.board.get_distinct_moves():
+            game_end, game_winner = self.board.make_move(move)
+
+            child_key = self.get_key()
+            if game_end:
+                self.proof_numbers[child_key] = self.get_terminal_numbers(-symbol, game_winner)
+
+            self.board.unmake_move()
+
+            children.append((move, child_key))
+
+        while True:
+            proof = PN_INFINITY
+            disproof = 0
+
+            # Find the most-proving move, with the smallest disproof number, & the second smallest disproof number
+            best_move = -1
+            best_numbers = (1, 1)
+            second_disproof = PN_INFINITY
+
+            for move, child_key in children:
+                child_proof, child_disproof = self.proof_numbers.get(child_key, (1, 1))
+
+                disproof = min(disproof + child_proof, PN_INFINITY)
+
+                if child_disproof < proof:
+                    second_disproof = proof
+                    proof = child_disproof
+                    best_move = move
+                    best_numbers = (child_proof, child_disproof)
+                elif child_disproof < second_disproof:
+                    second_disproof = child_disproof
+
+            if proof >= proof_threshold or disproof >= disproof_threshold or self.nodes >= self.node_limit:
+                break
+
+            # Search the most-proving move until either its numbers change which move is most-proving, or this
+            # position reaches a threshold
+            self.board.make_move(best_move)
+            self.search(-symbol, disproof_threshold - disproof + best_numbers[0],
+                        min(proof_threshold, second_disproof + 1))
+            self.board.unmake_move()
+
+        self.proof_numbers[key] = (proof, disproof)
+
+        return proof, disproof
@@ -1,10 +1,14 @@
-import copy
 import os
 import random
 import time
 import ujson as json
 
+import numpy as np
+
+import constants
 from brains.brain import Brain
+from brains.replay import ReplayBuffer
+from ranking import get_ranking
 
 
 class Brain_QLearning(Brain):
@@ -24,8 +28,27 @@ class Brain_QLearning(Brain):
         self.epsilon = Q_EPSILON
         self.gamma = Q_GAMMA
 
-        # Initialise Q-Table
-        self.q_table = {}
+        # Experience replay stores each transition, & learns from random minibatches of stored transitions every few
+        # moves rather than from each move as it is played
+        self.replay = constants.Q_REPLAY
+        self.replay_buffer = ReplayBuffer(constants.Q_REPLAY_CAPACITY) if self.replay else None
+        self.replay_batch_size = constants.Q_REPLAY_BATCH_SIZE
+        self.replay_interval = constants.Q_REPLAY_INTERVAL
+
+        # Eligibility trace decay for Watkins's Q(lambda). Above 0, each game's moves are stored & learned from together
+        # once the game ends, so the final reward reaches every move of the game at once. Replay is then not used.
+        self.trace_lambda = constants.Q_LAMBDA
+
+        # Initialise Q-Table. Small boards have a row of action values for every reachable position, at the position's
+        # rank. On larger boards each state seen gets a row, found through the state index map. Rows are allocated in
+        # advance & the array doubles in size whenever it fills up. A state's occupied squares never change, so its
+        # invalid moves are set to -inf when its row is added & the row's maximum is its best move.
+        self.ranking = None
+        if self.board.squares <= constants.Q_RANKED_SQUARES:
+            self.ranking = get_ranking(self.board.configuration, include_ended=True)
+
+        self.state_indexes = {}
+        self.set_table([], np.zeros((0, self.board.squares), dtype=np.float32))
 
         self.data_file = os.path.join(self.board.brain_data_folder, "q_table_{}.json".format(self.player.symbol_string))
 
@@ -34,16 +57,21 @@ class Brain_QLearning(Brain):
     def reset(self):
         self.last_state_action = None
         self.last_state = None
+        self.last_explored = False
 
-    def get_move(self):
-        # Check key exists for current board
-        board_identifier, state_board, board_rotate, board_flip = self.board.get_identifier(return_details=True)
+        # (state, action, explored, reward, next state) of each of our moves this game
+        self.trajectory = []
 
-        if board_identifier not in self.q_table:
-            self.q_table[board_identifier] = [0] * self.board.squares
+        # Identifier & Q-Table row of the last state looked up
+        self.state = None
+
+    def get_move(self):
+        state_index = self.get_state()
 
         # Check whether we want to explore or exploit
-        if random.random() < self.epsilon:
+        self.last_explored = random.random() < self.epsilon
+
+        if self.last_explored:
             # Explore, pick random move
             board_action = random.choice(self.board.get_valid_moves())
 
@@ -51,63 +79,219 @@ class Brain_QLearning(Brain):
             state_action = self.board.board_move_to_state(board_action)
         else:
             # Exploit, get best move
-            state_action = self.max_index(self.q_table[board_identifier], state_board.get_invalid_moves())
+            state_action = self.max_index(self.q_values[state_index])
 
             # Store our board action to update Q-Table
             board_action = self.board.state_move_to_board(state_action)
 
         # Store our current board & action so we can update Q-Table later on
         self.last_state_action = state_action
-        self.last_state = board_identifier
+        self.last_state = state_index
 
         return board_action, state_action
 
-    def update_q_value(self, reward):
+    def update_q_value(self, reward, game_end=False):
         if self.last_state is None:
             return
 
-        # Get old value for our last action
-        old_value = self.q_table[self.last_state][self.last_state_action]
+        state_index = self.get_state()
 
-        board_identifier = self.board.get_identifier()
-        if board_identifier not in self.q_table:
-            self.q_table[board_identifier] = [0] * self.board.squares
+        if self.trace_lambda:
+            self.trajectory.append((self.last_state, self.last_state_action, self.last_explored, reward, state_index))
+
+            if game_end:
+                self.update_traces()
+
+            return
+
+        if self.replay:
+            self.replay_buffer.add(self.last_state, self.last_state_action, reward, state_index)
+
+            if self.replay_buffer.added % self.replay_interval == 0:
+                self.replay_batch()
+
+            return
+
+        # Get old value for our last action
+        old_value = self.q_values[self.last_state, self.last_state_action]
 
         # Get the next maximum value for our new state
-        new_board_max = self.max_value(self.q_table[board_identifier], self.board.get_invalid_moves())
+        new_board_max = self.max_value(self.q_values[state_index])
 
         # Set new value
         new_value = old_value + (self.alpha * ((reward + self.gamma*new_board_max) - old_value))
 
-        self.q_table[self.last_state][self.last_state_action] = new_value
+        self.q_values[self.last_state, self.last_state_action] = new_value
+
+    def update_traces(self):
+        # Watkins's Q(lambda), worked backwards from the end of the game. Each move's return mixes the best value of the
+        # next state with the return of our next move, unless that move was exploratory & so says nothing about the
+        # best value.
+        states, actions, explored, rewards, next_states = map(np.array, zip(*self.trajectory))
+
+        next_values = self.max_values(self.q_values[next_states])
+
+        returns = np.zeros(len(rewards))
+        next_return = None
+
+        for move in reversed(range(len(rewards))):
+            if next_return is None or explored[move + 1]:
+                target = next_values[move]
+            else:
+                target = (1 - self.trace_lambda) * next_values[move] + self.trace_lambda * next_return
+
+            returns[move] = rewards[move] + self.gamma * target
+            next_return = returns[move]
+
+        self.q_values[states, actions] += self.alpha * (returns - self.q_values[states, actions])
+
+        self.trajectory = []
+
+    def replay_batch(self):
+        # Update the Q-Table from a random minibatch of stored transitions at once
+        states, actions, rewards, next_states = self.replay_buffer.sample(self.replay_batch_size)
+
+        next_values = self.max_values(self.q_values[next_states])
+
+        changes = self.alpha * ((rewards + self.gamma * next_values) - self.q_values[states, actions])
+
+        # The same transition can be sampled more than once, so changes are added rather than assigned
+        np.add.at(self.q_values, (states, actions), changes)
+
+    def get_state(self):
+        # Return the board's row in the Q-Table. The state updated after the opponent's move is the one our next move
+        # is picked from, so the row is only found once per state.
+        board_identifier = self.board.get_identifier()
+
+        if self.state is None or self.state[0] != board_identifier:
+            self.state = board_identifier, self.get_state_index(board_identifier)
+
+        return self.state[1]
+
+    def get_state_index(self, board_identifier):
+        # Return the state's row in the Q-Table, adding a row for states not seen before. Valid moves start at 0.
+        if self.ranking is not None:
+            return self.ranking.rank(board_identifier)
+
+        state_index = self.state_indexes.get(board_identifier)
+
+        if state_index is None:
+            state_index = len(self.state_indexes)
+            self.state_indexes[board_identifier] = state_index
+
+            if state_index == len(self.q_values):
+                self.q_values = np.concatenate((self.q_values, np.zeros_like(self.q_values)))
+
+            self.q_values[state_index] = np.where(self.get_valid_mask(board_identifier), 0, -np.inf)
 
-    def max_value(self, array, ignore_indexes):
-        # Remove ignore indexes
-        new_list = copy.copy(array)
+        return state_index
 
-        # Sort as to not throw off the other values
-        for index in sorted(ignore_indexes, reverse=True):
-            del new_list[index]
+    def get_table(self):
+        # Identifiers of every state with a row & their rows of the Q-Table, in row order
+        if self.ranking is not None:
+            return self.ranking.identifiers.tolist(), self.q_values
 
-        if len(new_list) == 0:
-            return 0
+        return list(self.state_indexes), self.q_values[:len(self.state_indexes)]
 
-        return max(new_list)
+    def set_table(self, identifiers, q_values):
+        # Replace the Q-Table, leaving room for new states. Stored transitions refer to the old table's rows.
+        if self.replay:
+            self.replay_buffer.clear()
 
-    def max_index(self, array, ignore_indexes):
-        max_value = self.max_value(array, ignore_indexes)
+        # Ranked rows of states not given keep their starting values
+        if self.ranking is not None:
+            ranked_identifiers = self.ranking.identifiers
 
-        return random.choice(
-            list(index for index, value in enumerate(array) if value == max_value and index not in ignore_indexes))
+            self.q_values = np.where(self.get_valid_masks(ranked_identifiers), 0, -np.inf).astype(np.float32)
+            if len(identifiers):
+                ranks = self.ranking.ranks(identifiers)
+                self.q_values[ranks[ranks >= 0]] = q_values[ranks >= 0]
+
+            return
+
+        self.state_indexes = {identifier: index for index, identifier in enumerate(identifiers)}
+
+        self.q_values = np.zeros((max(64, 2 * len(identifiers)), self.board.squares), dtype=np.float32)
+        if len(identifiers):
+            self.q_values[:len(identifiers)] = q_values
+
+    def merge_tables(self, tables):
+        # Merge (identifiers, q_values) tables that were trained from this Q-Table in other processes. Each value moves
+        # by the mean change of the tables that changed it, so values only one table learned are not diluted.
+        indexes = [np.array([self.get_state_index(identifier) for identifier in identifiers], dtype=np.int64)
+                   for identifiers, q_values in tables]
+
+        total_changes = np.zeros_like(self.q_values)
+        change_counts = np.zeros(self.q_values.shape, dtype=np.int32)
+
+        for state_indexes, (identifiers, q_values) in zip(indexes, tables):
+            # Invalid moves stay at -inf, & do not change. They are left out of the subtraction, as -inf - -inf is nan.
+            changes = np.subtract(q_values, self.q_values[state_indexes], where=np.isfinite(q_values),
+                                  out=np.zeros_like(q_values))
+
+            total_changes[state_indexes] += changes
+            change_counts[state_indexes] += changes != 0
+
+        self.q_values += total_changes / np.maximum(change_counts, 1)
+
+    def get_valid_mask(self, board_identifier):
+        # Mask of the state board's moves that are valid. The identifier already holds the state board, with crosses in
+        # its high half, noughts in its low half & the first state move as the most significant bit of each.
+        squares = self.board.squares
+        occupied = (board_identifier >> squares | board_identifier) & self.board.geometry.full_mask
+
+        bits = np.unpackbits(np.frombuffer(occupied.to_bytes((squares + 7) // 8, "big"), dtype=np.uint8))
+
+        return bits[-squares:] == 0
+
+    def get_valid_masks(self, board_identifiers):
+        # Valid move masks of many uint64 identifiers at once, one row per identifier
+        squares = self.board.squares
+        full_mask = np.uint64(self.board.geometry.full_mask)
+        occupied = (board_identifiers >> np.uint64(squares) | board_identifiers) & full_mask
+
+        shifts = np.arange(squares - 1, -1, -1, dtype=np.uint64)
+
+        return (occupied[:, None] >> shifts & np.uint64(1)) == 0
+
+    def max_value(self, values):
+        # Full boards have no moves left to value
+        max_value = values.max()
+
+        return max_value if max_value > -np.inf else 0
+
+    def max_values(self, rows):
+        # Maximum value of each row's valid moves. Full boards have no moves left to value.
+        max_values = rows.max(axis=1)
+        max_values[max_values == -np.inf] = 0
+
+        return max_values
+
+    def max_index(self, values):
+        # argmax picks the first of the highest values. Only pick randomly when that is not also the last of them.
+        best_move = values.argmax()
+
+        if best_move + values[::-1].argmax() != len(values) - 1:
+            best_moves = np.flatnonzero(values == values[best_move])
+            best_move = best_moves[random.randrange(len(best_moves))]
+
+        return int(best_move)
 
     def save(self):
         time_before = time.time()
 
         print("Saving Q-Table data for {}.".format(self.player.name))
 
+        self.create_data_folder(self.data_file)
+
         with open(self.data_file, "w") as file:
-            # Dump q_table to json file
-            json.dump({str(k): v for k, v in self.q_table.items()}, file, double_precision=16)
+            # Dump Q-Table to json file, one list of action values per state. JSON has no -inf, so invalid moves are
+            # saved as 0.
+            identifiers, q_values = self.get_table()
+            q_values = np.where(np.isfinite(q_values), q_values, 0)
+
+            json.dump({str(identifier): row.tolist() for identifier, row in zip(identifiers, q_values)}, file,
+                      double_precision=16)
 
         print("Saved {}'s Q-Table data to {}. {:.1f}s taken to save JSON file.".format(self.player.name, self.data_file,
                                                                                        time.time() - time_before))
@@ -128,10 +312,60 @@ class Brain_QLearning(Brain):
         # Save time taken to load file.
         time_loaded = time.time()
 
-        # Convert string keys to tuples
-        self.q_table = {eval(k): v for k, v in temp.items()}
+        # Convert string keys back to integer identifiers, & set invalid moves back to -inf
+        identifiers = [self.board.load_identifier(eval(k)) for k in temp]
+        q_values = np.array(list(temp.values()), dtype=np.float32).reshape((len(identifiers), self.board.squares))
+
+        for index, identifier in enumerate(identifiers):
+            q_values[index][~self.get_valid_mask(identifier)] = -np.inf
+
+        self.set_table(identifiers, q_values)
+
         time_finished = time.time()
 
         print(
-            "Successfully loaded Q-Table data for {}. {:.1f}s taken to load JSON file. {:.1f}s taken to convert key tuples.".format(
+            "Successfully loaded Q-Table data for {}. {:.1f}s taken to load JSON file. {:.1f}s taken to convert keys.".format(
                 self.player.name, time_loaded - time_before, time_finished - time_loaded))
+
+
+def play_training_game(board):
+    # Play a game between the board's players, updating both of their Q-Learning brains after every move
+    player_x = board.player_x
+    player_o = board.player_o
+
+    # Set initial game stats
+    game_end, game_winner = False, None
+
+    current_player = player_x
+    inactive_player = player_o
+
+    board.reset()
+    player_x.brain.reset()
+    player_o.brain.reset()
+
+    while not game_end:
+        board_action, state_action = current_player.get_move()
+
+        game_end, game_winner = board.play(current_player, board_action)
+
+        # Update reward
+        if game_end:
+            if game_winner == player_x:
+                player_x.brain.update_q_value(constants.Q_REWARD, True)
+                player_o.brain.update_q_value(-constants.Q_REWARD, True)
+            elif game_winner == player_o:
+                player_o.brain.update_q_value(constants.Q_REWARD, True)
+                player_x.brain.update_q_value(-constants.Q_REWARD, True)
+            elif game_winner == constants.DRAW:
+                # Update both players as it was a draw, their previous moves weren't bad
+                player_x.brain.update_q_value(constants.Q_REWARD / 2, True)
+                player_o.brain.update_q_value(constants.Q_REWARD / 2, True)
+        else:
+            # If the game didn't end on the next turn, update that move's reward as it didn't lead to a loss.
+            inactive_player.brain.update_q_value(0)
+
+        # Swap player
+        current_player = player_o if current_player == player_x else player_x
+        inactive_player = player_o if current_player == player_x else player_x
+
+    return game_winner
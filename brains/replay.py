@@ -0,0 +1,43 @@
+import numpy as np
+
+
+# Fixed-size ring buffer of Q-Learning transitions, stored in flat arrays so minibatches can be sampled & learned from
+# with array operations. Once full, the oldest transitions are overwritten.
+# States are rows of the Q-Table, so a buffer is only valid for the Q-Table it was filled from.
+class ReplayBuffer:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+
+        # Number of transitions stored, next position to write to & transitions added in total
+        self.size = 0
+        self.position = 0
+        self.added = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state):
+        self.states[self.position] = state
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.next_states[self.position] = next_state
+
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.added += 1
+
+    def sample(self, batch_size):
+        # Return a minibatch of transitions picked uniformly at random, with replacement
+        indexes = np.random.randint(0, self.size, batch_size)
+
+        return self.states[indexes], self.actions[indexes], self.rewards[indexes], self.next_states[indexes]
+
+    def clear(self):
+        self.size = 0
+        self.position = 0
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+
+from ranking import PositionRanking
+
+
+# Exact score & best state move for every reachable canonical position of a configuration, as found by solver.py.
+# Scores & moves are stored in arrays indexed by each position's rank, so no Python objects are stored per position.
+class SolvedTable:
+
+    def __init__(self, identifiers, scores, state_moves):
+        self.ranking = PositionRanking(identifiers)
+        self.scores = scores
+        self.state_moves = state_moves
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def probe(self, identifier):
+        # Return (score, state_move) for the identifier, or None if it is not a solved position
+        try:
+            rank = self.ranking.rank(identifier)
+        except KeyError:
+            return None
+
+        return int(self.scores[rank]), int(self.state_moves[rank])
+
+    def save(self, file):
+        np.savez_compressed(file, identifiers=self.ranking.identifiers, scores=self.scores,
+                            state_moves=self.state_moves)
+
+
+def get_solved_file(board):
+    return os.path.join(board.brain_data_folder, "solved.npz")
+
+
+def load_solved_table(board):
+    # Return the board's solved table, or None if its configuration has not been solved
+    solved_file = get_solved_file(board)
+    if not os.path.exists(solved_file):
+        return None
+
+    data = np.load(solved_file)
+
+    return SolvedTable(data["identifiers"], data["scores"], data["state_moves"])
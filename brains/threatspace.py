@@ -0,0 +1,111 @@
+import constants
+from board import iterate_bits
+from brains.brain import Brain
+
+
+def get_window_squares(board, symbol, missing, windows=None):
+    # Mask of the empty squares of windows that symbol is missing this many symbols from, & that hold none of the
+    # opponent's. Missing 1, symbol would complete a window straight away there. Missing 2, it would make a threat.
+    # Only the given windows are checked, or every window by default.
+    if windows is None:
+        windows = board.geometry.windows
+
+    mask = board.get_mask(symbol)
+    opp_mask = board.get_mask(-symbol)
+    needed = board.symbols_needed - missing
+
+    squares = 0
+    for window in windows:
+        if not window & opp_mask and bin(window & mask).count("1") == needed:
+            squares |= window & ~mask
+
+    return squares
+
+
+def find_forced_win(board, depth=None):
+    # Return a move that wins for the player to move through a sequence of threats, or -1 if none is found within depth
+    # threats. Only threats & the replies they force are searched, so it finds wins far deeper than a full-width search.
+    if depth is None:
+        depth = constants.THREAT_SEARCH_DEPTH
+
+    return search_threats(board, board.get_current_player().symbol, depth)
+
+
+def search_threats(board, symbol, depth):
+    winning_squares = get_window_squares(board, symbol, 1)
+    if winning_squares:
+        return next(iterate_bits(winning_squares))
+
+    if depth == 0:
+        return -1
+
+    opp_winning_squares = get_window_squares(board, -symbol, 1)
+
+    if opp_winning_squares:
+        # The opponent's threat has to be blocked, & more than one cannot be. The attack only goes on if the block is
+        # itself a threat.
+        if opp_winning_squares & (opp_winning_squares - 1):
+            return -1
+
+        moves = opp_winning_squares & get_window_squares(board, symbol, 2)
+    else:
+        moves = get_window_squares(board, symbol, 2)
+
+    for move in iterate_bits(moves):
+        board.make_move(move)
+
+        threats = get_window_squares(board, symbol, 1)
+        found = False
+
+        # The opponent can ignore any threat if they can win straight away
+        if not get_window_squares(board, -symbol, 1):
+            if threats & (threats - 1):
+                # Two threats cannot both be blocked
+                found = True
+            else:
+                # A single threat forces the opponent to block it
+                board.make_move(next(iterate_bits(threats)))
+                found = search_threats(board, symbol, depth - 1) != -1
+                board.unmake_move()
+
+        board.unmake_move()
+
+        if found:
+            return move
+
+    return -1
+
+
+# Plays wins found by threat-space search, blocks the opponent's immediate wins, and otherwise plays the square in the
+# most windows either player can still complete.
+class Brain_ThreatSpace(Brain):
+
+    def __init__(self, player, opp_player, board):
+        super().__init__()
+        self.player = player
+        self.opp_player = opp_player
+        self.board = board
+
+        self.name = "Threat-Space Search"
+
+    def get_move(self):
+        move = find_forced_win(self.board)
+        if move != -1:
+            return move, 0
+
+        opp_winning_squares = get_window_squares(self.board, self.opp_player.symbol, 1)
+        if opp_winning_squares:
+            return next(iterate_bits(opp_winning_squares)), 0
+
+        occupied = self.board.cross_mask | self.board.nought_mask
+        player_mask = self.board.get_mask(self.player.symbol)
+        opp_mask = self.board.get_mask(self.opp_player.symbol)
+
+        def open_windows(move):
+            # Windows through the move that are still open for the player or the opponent, then surrounding symbols
+            windows = self.board.geometry.windows_through[move]
+            return (sum(1 for window in windows if not window & opp_mask) +
+                    sum(1 for window in windows if not window & player_mask),
+                    bin(occupied & self.board.geometry.neighbours[move]).count("1"))
+
+        return max(self.board.get_valid_moves(), key=open_windows), 0
@@ -0,0 +1,116 @@
+import hashlib
+
+import numpy as np
+
+import constants
+from geometry import get_configuration_key
+
+
+# Fixed-size table of search results, stored in preallocated NumPy arrays rather than a dict of dicts.
+# Positions hash to a bucket of two slots. The first slot keeps the entry searched to the greatest depth, and the second
+# slot is always replaced, so deep results survive while recent positions can still be stored.
+class TranspositionTable:
+
+    # Bytes used by one slot across all arrays
+    SLOT_BYTES = 8 + 8 + 2 + 1 + 2 + 1
+
+    # Multiplier for Fibonacci hashing of locks into buckets
+    HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+    MASK_64 = (1 << 64) - 1
+
+    def __init__(self, memory=None):
+        if memory is None:
+            memory = constants.NEGAMAX_TT_MEMORY
+
+        # Use the largest power of two number of buckets that fits in the memory cap
+        self.bucket_bits = max(1, (memory // (2 * self.SLOT_BYTES)).bit_length() - 1)
+        self.buckets = 1 << self.bucket_bits
+        self.slots = 2 * self.buckets
+
+        self.locks = np.zeros(self.slots, dtype=np.uint64)
+        self.scores = np.zeros(self.slots, dtype=np.float64)
+        self.depths = np.zeros(self.slots, dtype=np.int16)
+        self.flags = np.zeros(self.slots, dtype=np.int8)
+        self.moves = np.zeros(self.slots, dtype=np.int16)
+        self.used = np.zeros(self.slots, dtype=bool)
+
+        # Whether saved data has been loaded into the table
+        self.loaded = False
+
+    def clear(self):
+        self.used[:] = False
+
+    def __len__(self):
+        return int(np.count_nonzero(self.used))
+
+    def get_lock(self, identifier):
+        # Identifiers of boards up to 32 squares fit in 64 bits and are stored exactly. Larger identifiers are reduced
+        # to a 64-bit digest of all their bits, with the top bit set so they cannot be mistaken for an exact identifier.
+        # Python's hash() is not used as it reduces ints modulo 2^61 - 1, so bits 61 apart would collide.
+        if identifier <= self.MASK_64:
+            return identifier
+
+        digest = hashlib.blake2b(identifier.to_bytes((identifier.bit_length() + 7) // 8, "little"), digest_size=8)
+        return int.from_bytes(digest.digest(), "little") | (1 << 63)
+
+    def get_slot(self, lock):
+        # First slot of the lock's bucket
+        return ((lock * self.HASH_MULTIPLIER) & self.MASK_64) >> (64 - self.bucket_bits) << 1
+
+    def probe(self, identifier):
+        # Return (score, depth, flag, state_move) for the identifier, or None if it is not in the table
+        lock = self.get_lock(identifier)
+        slot = self.get_slot(lock)
+
+        for slot in (slot, slot + 1):
+            if self.used[slot] and int(self.locks[slot]) == lock:
+                return float(self.scores[slot]), int(self.depths[slot]), int(self.flags[slot]), int(self.moves[slot])
+
+        return None
+
+    def store(self, identifier, score, depth, flag, state_move):
+        self.store_lock(self.get_lock(identifier), score, depth, flag, state_move)
+
+    def store_lock(self, lock, score, depth, flag, state_move):
+        slot = self.get_slot(lock)
+
+        # Replace the depth-preferred slot if it holds this position, is empty or was searched less deeply.
+        # Otherwise use the always-replace slot.
+        if self.used[slot] and int(self.locks[slot]) != lock and depth < self.depths[slot]:
+            slot += 1
+
+        self.locks[slot] = lock
+        self.scores[slot] = score
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+        self.moves[slot] = state_move
+        self.used[slot] = True
+
+    def save(self, file):
+        # Only used slots are saved. Entries are re-stored by lock on load, so the table size may change.
+        used = self.used
+        np.savez(file, locks=self.locks[used], scores=self.scores[used], depths=self.depths[used],
+                 flags=self.flags[used], moves=self.moves[used])
+
+    def load(self, file):
+        data = np.load(file)
+
+        for lock, score, depth, flag, state_move in zip(data["locks"].tolist(), data["scores"].tolist(),
+                                                        data["depths"].tolist(), data["flags"].tolist(),
+                                                        data["moves"].tolist()):
+            self.store_lock(lock, score, depth, flag, state_move)
+
+
+# One table per configuration, shared by every brain in the process. Scores are relative to the player to move, and as
+# X always moves first an identifier already determines whose move it is, so both players can use the same entries.
+_shared_tables = {}
+
+
+def get_shared_table(configuration):
+    key = get_configuration_key(configuration)
+
+    if key not in _shared_tables:
+        _shared_tables[key] = TranspositionTable()
+
+    return _shared_tables[key]
@@ -1,8 +1,3 @@
-from brains.montecarlo import Brain_MonteCarlo
-from brains.negamax_abp import Brain_Negamax_ABP
-from brains.qlearning import Brain_QLearning
-from brains.random import Brain_Random
-
 # Symbol definition
 
 NOUGHT = -1
@@ -17,6 +12,11 @@ CONFIGURATIONS = {
         "symbols_needed": 3,
         "squares": 9
     },
+    4: {
+        "size": 4,
+        "symbols_needed": 4,
+        "squares": 16
+    },
     5: {
         "size": 5,
         "symbols_needed": 4,
@@ -26,37 +26,22 @@ CONFIGURATIONS = {
         "size": 7,
         "symbols_needed": 4,
         "squares": 49
+    },
+    15: {
+        "size": 15,
+        "symbols_needed": 5,
+        "squares": 225
+    },
+    19: {
+        "size": 19,
+        "symbols_needed": 5,
+        "squares": 361
     }
 }
+# Rectangular m x n boards are configured with "rows" & "columns" in place of "size", e.g.
+# {"rows": 6, "columns": 7, "symbols_needed": 4, "squares": 42}
 
 
-ALGORITHMS = {
-    "Negamax":
-        {
-            "name": "Negamax",
-            "description": "Negamax is an algorithm that will evaluate all possible boards to search for a best move. Negamax is a variant to Minimax.",
-            "brain": Brain_Negamax_ABP
-        },
-    "MCTS":
-        {
-            "name": "Monte Carlo Tree Search",
-            "description": "Monte Carlo Tree Search is an algorithm that selects a best move based on simulations of playing that move. After many simulations, the algorithm selects a best move through analysing win-rate.",
-            "brain": Brain_MonteCarlo
-        },
-    "QLearning":
-        {
-            "name": "Reinforcement Learning",
-            "description": "Reinforcement Learning is a machine learning algorithm that learns the best move through analysing which moves results in positive outcomes for the AI for thousands of test games.",
-            "brain": Brain_QLearning
-        },
-    "Random":
-        {
-            "name": "Random",
-            "description": "Random moves picked.",
-            "brain": Brain_Random
-        }
-}
-
 # Modes
 SMART = 0
 TRAIN = 1
@@ -68,6 +53,67 @@ Q_EPSILON = 0.135
 Q_GAMMA = 0.6
 Q_TRAIN_GAMES = 3500
 Q_REWARD = 1
+# Processes to play training games in. 1 trains in this process.
+Q_WORKERS = 1
+# Games each worker plays between merges of the Q-Tables
+Q_MERGE_GAMES = 250
+# Learn from minibatches of stored transitions (experience replay) rather than from each move as it is played
+Q_REPLAY = False
+# Transitions kept for replay, transitions per minibatch & moves between minibatches. Each transition is learned from
+# batch size / interval times on average.
+Q_REPLAY_CAPACITY = 10000
+Q_REPLAY_BATCH_SIZE = 32
+Q_REPLAY_INTERVAL = 8
+# Eligibility trace decay for Watkins's Q(lambda), learning from whole games once they end. 0 learns from each move as
+# it is played.
+Q_LAMBDA = 0
+# Boards of up to this many squares keep a Q-Table row for every reachable position, indexed by the position's rank.
+# Larger boards add rows only for the states they see.
+Q_RANKED_SQUARES = 9
+# Training games between measurements of each Q-Learning brain's win rate against random moves, & games played for each
+Q_TEST_INTERVAL = 500
+Q_TEST_GAMES = 300
+
+# Function approximation parameters. The reward is Q_REWARD, as for Q-Learning.
+APPROX_LEARNING_RATE = 0.5
+APPROX_EPSILON = 0.1
+APPROX_GAMMA = 0.9
+APPROX_HIDDEN_UNITS = 16
+# Moves learned from in each step of gradient descent
+APPROX_BATCH_SIZE = 32
+APPROX_TRAIN_GAMES = 20000
 
 # MCTS parameters
 MCTS_SIMULATION_COUNT = 1250
+# Take & block immediate wins in playouts, & only expand winning or blocking moves where there are any
+MCTS_THREAT_GUARD = True
+
+# Negamax parameters
+NEGAMAX_TT_MEMORY = 16 * 1024 ** 2
+NEGAMAX_TIME_LIMIT = 5
+# One of "alphabeta", "pvs", "aspiration" or "mtdf"
+NEGAMAX_SEARCH_DRIVER = "alphabeta"
+# Half-width of aspiration windows. Estimated scores lie within (-1, 1) and results are whole numbers.
+NEGAMAX_ASPIRATION_WINDOW = 0.25
+# Width of null windows, used to test whether a score is above or below a bound
+NEGAMAX_NULL_WINDOW = 1e-6
+# Look for wins through sequences of threats where the search stops
+NEGAMAX_THREAT_SEARCH = True
+# Processes to search root moves in parallel. 1 searches in this process.
+NEGAMAX_WORKERS = 1
+# Largest board train.py solves fully. Larger boards are trained through semi-random games, whose searched scores are
+# saved instead.
+NEGAMAX_SOLVE_SQUARES = 16
+NEGAMAX_TRAIN_GAMES = 500
+
+# Proof-number search parameters. Positions searched for each move, & positions kept between moves.
+PN_NODE_BUDGET = 20000
+PN_TABLE_SIZE = 200000
+
+# Threat-space search parameters. Threats to search through before giving up on a forced win.
+THREAT_SEARCH_DEPTH = 3
+
+# Transposition table bound types
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
@@ -1,6 +1,9 @@
 import os
 
+import numpy as np
+
 import constants
+from board_batch import BoardBatch
 
 
 class Result:
@@ -23,6 +26,12 @@ class Result:
         else:
             self.wins_o += 1
 
+    def add_batch(self, game_winners):
+        # Add the winners of a batch of finished games, given as symbols
+        self.wins_x += int(np.count_nonzero(game_winners == constants.CROSS))
+        self.wins_o += int(np.count_nonzero(game_winners == constants.NOUGHT))
+        self.draws += int(np.count_nonzero(game_winners == constants.DRAW))
+
     def get_wins(self, player):
         if player == constants.DRAW:
             return self.draws
@@ -48,3 +57,28 @@ class Result:
                                   "MCTS Simulations: {}".format(constants.MCTS_SIMULATION_COUNT),
                                   "Cross,Nought,Draw",
                                   "{},{},{}".format(self.wins_x, self.wins_o, self.draws)]))
+
+
+def play_random_games(configuration, amount, batch_size=500):
+    # Play games of random moves for both players, many games at a time
+    game_results = Result()
+
+    batch = BoardBatch(configuration, min(batch_size, amount))
+    playing = np.ones(batch.games, dtype=bool)
+    games_started = batch.games
+
+    while np.any(playing):
+        game_end, game_winners = batch.play(batch.get_random_moves(), playing)
+
+        # Update winner stats
+        game_results.add_batch(game_winners[game_end])
+
+        # Start new games in place of finished ones until enough have been started, then stop playing them
+        finished = np.flatnonzero(game_end)
+        restarted = finished[:amount - games_started]
+
+        batch.reset(restarted)
+        games_started += len(restarted)
+        playing[finished[len(restarted):]] = False
+
+    return game_results
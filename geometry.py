@@ -0,0 +1,150 @@
+import numpy as np
+
+
+def get_dimensions(configuration):
+    # Square configurations give a size, m x n configurations give rows & columns
+    return configuration.get("rows", configuration.get("size")), configuration.get("columns", configuration.get("size"))
+
+
+def get_configuration_key(configuration):
+    # Configurations with the same dimensions & k share everything cached for them
+    return get_dimensions(configuration) + (configuration["symbols_needed"],)
+
+
+# Board layout information that is shared by every board of the same configuration.
+# Moves are numbered row by row, and move n is stored as bit n of a player's mask.
+class Geometry:
+
+    # Row & column steps for horizontal, vertical, diagonal and anti-diagonal lines
+    DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+    def __init__(self, configuration):
+        self.rows, self.columns = get_dimensions(configuration)
+        self.squares = configuration["squares"]
+        self.symbols_needed = configuration["symbols_needed"]
+
+        # Mask with a bit set for every square on the board
+        self.full_mask = (1 << self.squares) - 1
+
+        # Every k-in-a-row window on the board as a bit mask
+        self.windows = []
+
+        for row in range(self.rows):
+            for column in range(self.columns):
+                for row_step, column_step in self.DIRECTIONS:
+                    end_row = row + row_step * (self.symbols_needed - 1)
+                    end_column = column + column_step * (self.symbols_needed - 1)
+
+                    # Skip windows that would run off the board
+                    if not (0 <= end_row < self.rows and 0 <= end_column < self.columns):
+                        continue
+
+                    window = 0
+                    for step in range(self.symbols_needed):
+                        window |= 1 << ((row + row_step * step) * self.columns + column + column_step * step)
+
+                    self.windows.append(window)
+
+        # Squares of every window as a (windows, symbols_needed) index array, for checking windows of array boards
+        self.window_indexes = np.array([[move for move in range(self.squares) if window >> move & 1]
+                                        for window in self.windows])
+
+        # Windows that pass through each square. Only these can be completed by a move on that square.
+        self.windows_through = [tuple(window for window in self.windows if window >> move & 1)
+                                for move in range(self.squares)]
+
+        # How many windows each square is part of. Central squares take part in the most.
+        self.window_counts = [len(windows) for windows in self.windows_through]
+
+        # Per-window symbol counts are packed into one integer per player, each window getting a field wide enough to
+        # count to symbols_needed. A square's window units have a 1 in the field of every window through it, so
+        # placing a symbol adds them & removing it subtracts them. Window ones has a 1 in every window's field.
+        self.window_field_bits = self.symbols_needed.bit_length()
+        window_fields = {window: index * self.window_field_bits for index, window in enumerate(self.windows)}
+
+        self.window_units = [sum(1 << window_fields[window] for window in windows)
+                             for windows in self.windows_through]
+        self.window_ones = sum(1 << field for field in window_fields.values())
+
+        # No game can be a dead draw before every window holds a symbol of each player, which takes at least this many
+        # moves as each symbol is part of at most the most windows through any square
+        self.dead_draw_ply = 2 * -(-len(self.windows) // max(self.window_counts))
+
+        # Mask of the (up to 8) squares surrounding each square
+        self.neighbours = [self.neighbour_mask(move) for move in range(self.squares)]
+
+        # For each square and line direction, the bits stepping forwards & backwards from the square.
+        # Rays stop at the board edge or after symbols_needed - 1 steps, as a longer run cannot matter.
+        self.rays = [tuple((self.ray(move, row_step, column_step), self.ray(move, -row_step, -column_step))
+                           for row_step, column_step in self.DIRECTIONS)
+                     for move in range(self.squares)]
+
+        # Symmetries of the board, in the order get_identifier has always tried them: the 4 rotations of the board,
+        # then the 4 rotations of the vertically flipped board. Each permutation maps a board move to a state move.
+        # Quarter turns change the shape of a rectangular board, so those boards only have 4 symmetries.
+        self.transforms = []
+        self.permutations = []
+
+        rotations = range(4) if self.rows == self.columns else range(0, 4, 2)
+
+        indexes = np.arange(self.squares).reshape((self.rows, self.columns))
+        for flip in range(2):
+            grid = np.flip(indexes, 0) if flip else indexes
+
+            for rotate in rotations:
+                permutation = [0] * self.squares
+                for state_move, board_move in enumerate(np.rot90(grid, rotate).flatten()):
+                    permutation[board_move] = state_move
+
+                self.transforms.append((rotate, flip))
+                self.permutations.append(tuple(permutation))
+
+        # Inverse of each permutation, mapping a state move back to a board move
+        self.inverse_permutations = [tuple(sorted(range(self.squares), key=permutation.__getitem__))
+                                     for permutation in self.permutations]
+
+        # Zobrist keys for each move under each symmetry. Rather than random numbers, every (symbol, square) pair gets
+        # its own bit, so keys are exact integers and ordered like the old (sum_x, sum_o) identifiers: crosses in the
+        # high half, with the first square as the most significant bit.
+        self.cross_keys = [tuple(1 << (2 * self.squares - 1 - permutation[move]) for permutation in self.permutations)
+                           for move in range(self.squares)]
+        self.nought_keys = [tuple(1 << (self.squares - 1 - permutation[move]) for permutation in self.permutations)
+                            for move in range(self.squares)]
+
+    def neighbour_mask(self, move):
+        row, column = move // self.columns, move % self.columns
+
+        mask = 0
+        for neighbour_row in range(max(0, row - 1), min(self.rows, row + 2)):
+            for neighbour_column in range(max(0, column - 1), min(self.columns, column + 2)):
+                mask |= 1 << (neighbour_row * self.columns + neighbour_column)
+
+        # The square itself is not its own neighbour
+        return mask & ~(1 << move)
+
+    def ray(self, move, row_step, column_step):
+        row, column = move // self.columns, move % self.columns
+
+        bits = []
+        for step in range(1, self.symbols_needed):
+            ray_row, ray_column = row + row_step * step, column + column_step * step
+
+            if not (0 <= ray_row < self.rows and 0 <= ray_column < self.columns):
+                break
+
+            bits.append(1 << (ray_row * self.columns + ray_column))
+
+        return tuple(bits)
+
+
+# Geometries are immutable, so a single instance is shared per configuration
+_geometries = {}
+
+
+def get_geometry(configuration):
+    key = get_configuration_key(configuration)
+
+    if key not in _geometries:
+        _geometries[key] = Geometry(configuration)
+
+    return _geometries[key]
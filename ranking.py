@@ -0,0 +1,86 @@
+import numpy as np
+
+import constants
+from board import Board
+from geometry import get_configuration_key
+
+
+# Maps every reachable canonical position with a move left to play to a dense rank in [0, N), and back.
+# Ranks are positions in the sorted list of identifiers, so tabular data for a configuration can be kept in flat arrays
+# indexed by rank rather than in dicts keyed by identifier.
+class PositionRanking:
+
+    def __init__(self, identifiers):
+        self.identifiers = identifiers
+
+    def __len__(self):
+        return len(self.identifiers)
+
+    def rank(self, identifier):
+        index = int(np.searchsorted(self.identifiers, identifier))
+
+        if index == len(self.identifiers) or self.identifiers[index] != identifier:
+            raise KeyError("Identifier is not a ranked position: {}".format(identifier))
+
+        return index
+
+    def ranks(self, identifiers):
+        # Rank many identifiers at once. Identifiers that are not ranked positions get -1.
+        identifiers = np.asarray(identifiers, dtype=np.uint64)
+
+        indexes = np.searchsorted(self.identifiers, identifiers)
+        found = self.identifiers[np.minimum(indexes, len(self.identifiers) - 1)] == identifiers
+
+        return np.where(found, indexes, -1)
+
+    def unrank(self, rank):
+        return int(self.identifiers[rank])
+
+
+def enumerate_positions(configuration, include_ended=False):
+    # Return the identifier of every reachable canonical position where the game has not ended, & also of those where
+    # it has if include_ended is set
+    board = Board(configuration)
+
+    # Identifiers must fit in a 64 bit array
+    if 2 * board.squares > 64:
+        raise ValueError("Boards of more than 32 squares cannot be ranked. Squares: {}".format(board.squares))
+
+    identifiers = set()
+
+    def visit():
+        identifiers.add(board.get_identifier())
+
+        symbol = constants.CROSS if board.get_ply() % 2 == 0 else constants.NOUGHT
+
+        for move in board.get_valid_moves():
+            board.place(symbol, move)
+            board.moves.append(move)
+
+            # Games end on a win, a full board or once no window can be completed. Positions already seen have had
+            # their moves visited.
+            if board.is_winning_move(move, symbol) or board.is_full() or board.is_dead_draw():
+                if include_ended:
+                    identifiers.add(board.get_identifier())
+            elif board.get_identifier() not in identifiers:
+                visit()
+
+            board.set_empty(move)
+
+    visit()
+
+    return identifiers
+
+
+# Enumerating a configuration's positions is slow, so a single ranking is shared per configuration
+_rankings = {}
+
+
+def get_ranking(configuration, include_ended=False):
+    key = get_configuration_key(configuration), include_ended
+
+    if key not in _rankings:
+        _rankings[key] = PositionRanking(np.array(sorted(enumerate_positions(configuration, include_ended)),
+                                                  dtype=np.uint64))
+
+    return _rankings[key]
@@ -13,16 +13,18 @@ old_hook = sys.excepthook
 sys.excepthook = catch_exceptions
 ###################################
 
-print("Loading UI for Noughts and Crosses.")
+# Worker processes import this module, so only run the UI when it is started directly
+if __name__ == "__main__":
+    print("Loading UI for Noughts and Crosses.")
 
-# Load UI for player
-from PyQt5 import QtWidgets
-from ui_controller import Menu
-import sys
+    # Load UI for player
+    from PyQt5 import QtWidgets
+    from ui_controller import Menu
+    import sys
 
-app = QtWidgets.QApplication(sys.argv)
+    app = QtWidgets.QApplication(sys.argv)
 
-menu_ui = Menu(app)
-menu_ui.show()
+    menu_ui = Menu(app)
+    menu_ui.show()
 
-app.exec()
+    app.exec()
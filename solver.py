@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+import constants
+from board import Board
+from brains.proofnumber import Brain_ProofNumber
+from brains.solved_table import SolvedTable, get_solved_file
+from player import Player
+
+
+def solve(configuration):
+    # Find the exact score & best move of every reachable canonical position. Every move is searched from every
+    # position without pruning, and a position is scored only once all positions after it have been, so the table is
+    # built from the end of the game back to the empty board.
+    board = Board(configuration)
+
+    # Identifiers must fit in the table's 64 bit array
+    if 2 * board.squares > 64:
+        raise ValueError("Boards of more than 32 squares cannot be solved. Squares: {}".format(board.squares))
+
+    board.player_x = Player(constants.CROSS, None)
+    board.player_o = Player(constants.NOUGHT, None)
+
+    scores = {}
+    state_moves = {}
+
+    def solve_position():
+        # Scores are relative to the player to move, and are the same as Negamax gives them
+        ply = board.get_ply()
+
+        best_score = None
+        best_move = -1
+
+        for move in board.get_valid_moves():
+            game_end, game_winner = board.make_move(move)
+
+            if game_end:
+                # A winning move scores higher the sooner it wins
+                score = 0 if game_winner == constants.DRAW else board.squares - ply
+            else:
+                identifier = board.get_identifier()
+
+                # Positions reached by another order of moves, or by a symmetric move, are only solved once
+                if identifier not in scores:
+                    solve_position()
+
+                score = -scores[identifier]
+
+            board.unmake_move()
+
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = move
+
+        identifier = board.get_identifier()
+        scores[identifier] = best_score
+        state_moves[identifier] = board.board_move_to_state(best_move)
+
+    solve_position()
+
+    # Store positions sorted by identifier, so each position's rank is its index
+    identifiers = np.array(sorted(scores), dtype=np.uint64)
+
+    return SolvedTable(identifiers,
+                       np.array([scores[identifier] for identifier in identifiers.tolist()], dtype=np.int16),
+                       np.array([state_moves[identifier] for identifier in identifiers.tolist()], dtype=np.int16))
+
+
+def solve_and_save(configuration):
+    time_before = time.time()
+
+    print("Solving {}x{} board.".format(configuration.get("rows", configuration.get("size")),
+                                        configuration.get("columns", configuration.get("size"))))
+
+    solved_table = solve(configuration)
+
+    # Create brain folder
+    solved_file = get_solved_file(Board(configuration))
+    os.makedirs(os.path.dirname(solved_file), exist_ok=True)
+
+    solved_table.save(solved_file)
+
+    print("Solved {} positions. Saved to {}. {:.1f}s taken.".format(len(solved_table), solved_file,
+                                                                     time.time() - time_before))
+
+    return solved_table
+
+
+def analyse_openings(configuration, node_budget=None):
+    # Prove the result of each first move that is not symmetric to another, for boards too large to solve fully.
+    # Results are for the first player: 1 is a win, 0 a draw, -1 a loss and None could not be proven.
+    board = Board(configuration)
+    board.player_x = Player(constants.CROSS, None)
+    board.player_o = Player(constants.NOUGHT, None)
+
+    brain = Brain_ProofNumber(board.player_x, board.player_o, board)
+    if node_budget is not None:
+        brain.node_budget = node_budget
+
+    results = {}
+    identifiers = set()
+
+    for move in board.get_valid_moves():
+        board.make_move(move)
+
+        identifier = board.get_identifier()
+        if identifier not in identifiers:
+            identifiers.add(identifier)
+
+            result = brain.get_result()
+            results[move] = None if result is None else -result
+
+            print("Opening {}: {}".format(move, {1: "Win", 0: "Draw", -1: "Loss", None: "Unproven"}[results[move]]))
+
+        board.unmake_move()
+
+    return results
+
+
+if __name__ == '__main__':
+    # Solve the configurations given by size, e.g. "python solver.py 3 4", or prove the openings of larger boards with
+    # proof-number search, e.g. "python solver.py --openings 5". Solving 4x4 visits about 1.1M positions, which took
+    # 17-20s on one AMD EPYC core with Python 3.11 & NumPy 2.4, & about 37s on another machine.
+    if sys.argv[1:2] == ["--openings"]:
+        for size in sys.argv[2:]:
+            analyse_openings(constants.CONFIGURATIONS[int(size)])
+    else:
+        for size in sys.argv[1:] or ["3"]:
+            solve_and_save(constants.CONFIGURATIONS[int(size)])
@@ -4,7 +4,14 @@ import random
 import sys
 
 import games
+import solver
 from board import Board
+from brains.approximation import Brain_Approximation
+from brains.montecarlo import Brain_MonteCarlo
+from brains.negamax_abp import Brain_Negamax_ABP
+from brains.parallel import train_q_learning
+from brains.proofnumber import Brain_ProofNumber
+from brains.qlearning import Brain_QLearning, play_training_game
 from constants import *
 from player import Player
 
@@ -67,253 +74,347 @@ def play_games(amount):
     return game_results
 
 
-# Initialise board
-board = Board(CONFIGURATIONS[3])
+def get_win_rates_against_random(amount):
+    # Fraction of games each player's brain wins against random moves, playing its best moves without exploring
+    win_rates = []
 
-# Create brain folders
-brain_path = os.path.join("brain_data", "{}x{}".format(board.size, board.size))
-if not os.path.exists(brain_path):
-    print("No save folder found for {}x{} board. Creating folder now.".format(board.size, board.size))
-    os.mkdir(brain_path)
+    for player, opp_player in ((player_x, player_o), (player_o, player_x)):
+        epsilon = player.brain.epsilon
+        player.brain.epsilon = 0
+        opp_player.set_mode(RANDOM)
 
-brains = ""
+        wins = 0
+
+        for i in range(amount):
+            # Set initial game stats
+            game_end, game_winner = False, None
+
+            current_player = player_x
+
+            board.reset()
+            player.brain.reset()
+
+            while not game_end:
+                board_action, state_action = current_player.get_move()
+
+                game_end, game_winner = board.play(current_player, board_action)
+
+                # Swap player
+                current_player = player_o if current_player == player_x else player_x
+
+            wins += game_winner == player
+
+        opp_player.set_mode(SMART)
+        player.brain.epsilon = epsilon
+
+        win_rates.append(wins / amount)
+
+    return win_rates
 
 
 def valid_brains(brain_input):
-    return len(brain_input) == 2 and all(brain in ["1", "2", "3"] for brain in brain_input)
+    return len(brain_input) == 2 and all(brain in ["1", "2", "3", "4", "5"] for brain in brain_input)
+
 
+# Worker processes import this module, so only run the script when it is started directly
+if __name__ == "__main__":
+    # Initialise board
+    board = Board(CONFIGURATIONS[3])
 
-while True:
-    brains = input("""
+    # Create brain folders
+    brain_path = os.path.join("brain_data", "{}x{}".format(board.size, board.size))
+    if not os.path.exists(brain_path):
+        print("No save folder found for {}x{} board. Creating folder now.".format(board.size, board.size))
+        os.mkdir(brain_path)
+
+    brains = ""
+
+    while True:
+        brains = input("""
 Which brain(s) would you like to use?
 QLearning - 1
 Minimax / Alpha Beta Pruning - 2
 Monte Carlo Tree Search - 3
+Proof-Number Search - 4
+Function Approximation - 5
 
 Enter in the form "XO", where X is the brain that player X will use
 and O is the brain that player O will use. E.g "12" will use QLearning for X and Minimax for 2.
 """)
 
-    if not valid_brains(brains):
-        print("Unrecognised input: \"{}\".".format(brains))
-    else:
-        break
+        if not valid_brains(brains):
+            print("Unrecognised input: \"{}\".".format(brains))
+        else:
+            break
 
-# Used for storing the initalised brain objects.
-saved_brains = {}
+    # Used for storing the initalised brain objects.
+    saved_brains = {}
 
-# Initialise players
-player_x = Player(CROSS, None)
-player_o = Player(NOUGHT, None)
+    # Initialise players
+    player_x = Player(CROSS, None)
+    player_o = Player(NOUGHT, None)
 
-board.player_x = player_x
-board.player_o = player_o
+    board.player_x = player_x
+    board.player_o = player_o
 
-# Q-Learning
-if "1" in brains:
-    # Initialise both brains, even if we don't need both of them.
-    brain_x = Brain_QLearning(player_x, player_o, board)
-    brain_o = Brain_QLearning(player_o, player_x, board)
+    # Q-Learning
+    if "1" in brains:
+        # Initialise both brains, even if we don't need both of them.
+        brain_x = Brain_QLearning(player_x, player_o, board)
+        brain_o = Brain_QLearning(player_o, player_x, board)
 
-    # Set brains
-    player_x.brain = brain_x
-    player_o.brain = brain_o
+        # Set brains
+        player_x.brain = brain_x
+        player_o.brain = brain_o
 
-    train_input = get_input("""Would you like to train or load brain data for Q-Learning?
+        train_input = get_input("""Would you like to train or load brain data for Q-Learning?
 Train - 1 (Start brains from scratch and train them.)
 Improve Trained - 2 (Load saved brain data and train them.)
 Pre-Trained - 3 (Load saved brain data.)""", ["1", "2", "3"])
 
-    # If 2 or 3 is picked, load the data.
-    if train_input == "2" or train_input == "3":
-        brain_x.load()
-        brain_o.load()
-        print("Loaded Q-Learning brain data.")
+        # If 2 or 3 is picked, load the data.
+        if train_input == "2" or train_input == "3":
+            brain_x.load()
+            brain_o.load()
+            print("Loaded Q-Learning brain data.")
 
-    # Train players if they've selected 1 or 2
-    if train_input == "1" or train_input == "2":
-        for i in range(Q_TRAIN_GAMES):
-            # Set initial game stats
-            game_end, game_winner = False, None
+        # Train players if they've selected 1 or 2
+        if train_input == "1" or train_input == "2":
+            if Q_WORKERS > 1:
+                # Play training games in worker processes, merging their Q-Tables into these brains
+                train_q_learning(board, Q_TRAIN_GAMES, Q_WORKERS)
+            else:
+                for i in range(Q_TRAIN_GAMES):
+                    play_training_game(board)
 
-            current_player = player_x
-            inactive_player = player_o
+                    if i % 500 == 0:
+                        print("Training games completed: {} ({:.1f}%)".format(i, i * 100 / Q_TRAIN_GAMES))
 
-            board.reset()
-            player_x.brain.reset()
-            player_o.brain.reset()
+                    # Measure how quickly the brains learn
+                    if (i + 1) % Q_TEST_INTERVAL == 0 and i + 1 < Q_TRAIN_GAMES:
+                        print("Win rate against Random after {} games: X {:.1%}, O {:.1%}".format(
+                            i + 1, *get_win_rates_against_random(Q_TEST_GAMES)))
 
-            while not game_end:
-                board_action, state_action = current_player.get_move()
+            print("Win rate against Random after {} games: X {:.1%}, O {:.1%}".format(
+                Q_TRAIN_GAMES, *get_win_rates_against_random(Q_TEST_GAMES)))
 
-                game_end, game_winner = board.play(current_player, board_action)
+            # Save trained info
+            brain_x.save()
+            brain_o.save()
+            print("Saved Q-Learning brain data.")
 
-                # Update reward
-                if game_end:
-                    if game_winner == player_x:
-                        brain_x.update_q_value(Q_REWARD)
-                        brain_o.update_q_value(-Q_REWARD)
-                    elif game_winner == player_o:
-                        brain_o.update_q_value(Q_REWARD)
-                        brain_x.update_q_value(-Q_REWARD)
-                    elif game_winner == DRAW:
-                        # Update both players as it was a draw, their previous moves weren't bad
-                        player_x.brain.update_q_value(Q_REWARD / 2)
-                        player_o.brain.update_q_value(Q_REWARD / 2)
-                else:
-                    # If the game didn't end on the next turn, update that move's reward as it didn't lead to a loss.
-                    inactive_player.brain.update_q_value(0)
+            # Force them to use their smartness
+            player_x.brain.epsilon = 0
+            player_o.brain.epsilon = 0
 
-                # Swap player
-                current_player = player_o if current_player == player_x else player_x
-                inactive_player = player_o if current_player == player_x else player_x
+        # Save brains for later
+        saved_brains["1"] = [brain_x, brain_o]
 
-            if i % 500 == 0:
-                print("Training games completed: {} ({:.1f}%)".format(i, i * 100 / Q_TRAIN_GAMES))
+    # Minimax
+    if "2" in brains:
 
-        # Save trained info
-        brain_x.save()
-        brain_o.save()
-        print("Saved Q-Learning brain data.")
+        # Initialise brains
+        brain_x = Brain_Negamax_ABP(player_x, player_o, board)
+        brain_o = Brain_Negamax_ABP(player_o, player_x, board)
 
-        # Force them to use their smartness
-        player_x.brain.epsilon = 0
-        player_o.brain.epsilon = 0
+        # Set brains
+        player_x.brain = brain_x
+        player_o.brain = brain_o
+
+        # Train brain:
+        train_input = get_input("Would you like to train or load pre-trained brains?\n"
+                                "Training for MiniMax involves a full game-tree analysis before being ready. Once trained, the algorithm is perfect. \n"
+                                "Train - 1\n"
+                                "Pre-Trained - 2", ["1", "2"])
+
+        # Always load data. Both brains share their saved scores, so this loads them for both.
+        brain_x.load()
+        brain_o.load()
 
-    # Save brains for later
-    saved_brains["1"] = [brain_x, brain_o]
+        if train_input == "1":
+            if board.squares <= NEGAMAX_SOLVE_SQUARES:
+                # Solve every reachable position, rather than relying on games to cover the game tree
+                solver.solve_and_save(board.configuration)
 
-# Minimax
-if "2" in brains:
+                # Load the new solved table
+                brain_x.load()
+                brain_o.load()
+            else:
+                try:
+                    for i in range(NEGAMAX_TRAIN_GAMES):
+                        # Set initial game stats
+                        game_end, game_winner = False, None
 
-    # Initialise brains
-    brain_x = Brain_Negamax_ABP(player_x, player_o, board)
-    brain_o = Brain_Negamax_ABP(player_o, player_x, board)
+                        current_player = player_x
 
-    # Set brains
-    player_x.brain = brain_x
-    player_o.brain = brain_o
+                        board.reset()
 
-    # Train brain:
-    train_input = get_input("Would you like to train or load pre-trained brains?\n"
-                            "Training for MiniMax involves a full game-tree analysis before being ready. Once trained, the algorithm is perfect. \n"
-                            "Train - 1\n"
-                            "Pre-Trained - 2", ["1", "2"])
+                        while not game_end:
+                            # Randomly pick moves in order to cover all possible board states
+                            if random.random() < 0.15:
+                                board_action = random.choice(board.get_valid_moves())
+                            else:
+                                board_action, state_action = current_player.get_move()
 
-    # Always load data
-    brain_x.load()
-    brain_o.load()
+                            game_end, game_winner = board.play(current_player, board_action)
 
-    if train_input == "1":
-        try:
-            for i in range(500):
-                # Set initial game stats
-                game_end, game_winner = False, None
+                            # Swap player
+                            current_player = player_o if current_player == player_x else player_x
 
-                current_player = player_x
-                inactive_player = player_o
+                except KeyboardInterrupt:
+                    print("Interrupted game loop. Saving brain data.")
 
-                board.reset()
+                # Both brains share their saved scores, so saving one saves them for both
+                brain_x.save()
 
-                while not game_end:
-                    # Randomly pick moves in order to cover all possible board states
-                    if random.random() < 0.15:
-                        board_action = random.choice(board.get_valid_moves())
-                    else:
-                        board_action, state_action = current_player.get_move()
+            print("Finished analysing game tree.")
 
-                    game_end, game_winner = board.play(current_player, board_action)
+        # Save brains for later
+        saved_brains["2"] = [brain_x, brain_o]
 
-                    # Swap player
-                    current_player = player_o if current_player == player_x else player_x
-                    inactive_player = player_o if current_player == player_x else player_x
+    if "3" in brains:
+        # Initialise brains
+        brain_x = Brain_MonteCarlo(player_x, player_o, board)
+        brain_o = Brain_MonteCarlo(player_o, player_x, board)
 
-        except KeyboardInterrupt:
-            print("Interrupted game loop. Saving brain data.")
+        # Set brains
+        player_x.brain = brain_x
+        player_o.brain = brain_o
 
-        # Print stats
-        print("Finished analysing game tree.")
+        # No initialisation required for MCTS
 
-        brain_x.save()
-        brain_o.save()
+        # Save brains for later
+        saved_brains["3"] = [brain_x, brain_o]
 
-    # Save brains for later
-    saved_brains["2"] = [brain_x, brain_o]
+    if "4" in brains:
+        # Initialise brains
+        brain_x = Brain_ProofNumber(player_x, player_o, board)
+        brain_o = Brain_ProofNumber(player_o, player_x, board)
 
-if "3" in brains:
-    # Initialise brains
-    brain_x = Brain_MonteCarlo(player_x, player_o, board)
-    brain_o = Brain_MonteCarlo(player_o, player_x, board)
+        # Set brains
+        player_x.brain = brain_x
+        player_o.brain = brain_o
 
-    # Set brains
-    player_x.brain = brain_x
-    player_o.brain = brain_o
+        # No initialisation required for Proof-Number Search
 
-    # No initialisation required for MCTS
+        # Save brains for later
+        saved_brains["4"] = [brain_x, brain_o]
 
-    # Save brains for later
-    saved_brains["3"] = [brain_x, brain_o]
+    if "5" in brains:
+        # Initialise brains
+        brain_x = Brain_Approximation(player_x, player_o, board)
+        brain_o = Brain_Approximation(player_o, player_x, board)
 
-# Set player brains
-player_x.brain = saved_brains[brains[0]][0]
-player_o.brain = saved_brains[brains[1]][1]
+        # Set brains
+        player_x.brain = brain_x
+        player_o.brain = brain_o
 
-# Test 2 algorithms against each other
-test_games = 2500
+        train_input = get_input("""Would you like to train or load brain data for Function Approximation?
+Train - 1 (Start brains from scratch and train them.)
+Improve Trained - 2 (Load saved brain data and train them.)
+Pre-Trained - 3 (Load saved brain data.)""", ["1", "2", "3"])
 
-for i in range(2):
+        if train_input == "2" or train_input == "3":
+            brain_x.load()
+            brain_o.load()
 
-    if i == 1:
-        # Swap brains
-        player_x.brain = saved_brains[brains[1]][0]
-        player_o.brain = saved_brains[brains[0]][1]
+        if train_input == "1" or train_input == "2":
+            # Self-play games are learned from the same way as Q-Learning's
+            for i in range(APPROX_TRAIN_GAMES):
+                play_training_game(board)
 
-    player_x.set_mode(SMART)
-    player_o.set_mode(SMART)
+                if i % 500 == 0:
+                    print("Training games completed: {} ({:.1f}%)".format(i, i * 100 / APPROX_TRAIN_GAMES))
 
-    print("--------------------")
-    print("Player X: {}".format(player_x.brain.name if player_x.mode == SMART else "Random"))
-    print("Player O: {}".format(player_o.brain.name if player_o.mode == SMART else "Random"))
-    print("--------------------")
+            brain_x.save()
+            brain_o.save()
 
-    # Test brains against each other
-    stats = play_games(test_games)
+        # Force them to use their smartness
+        brain_x.epsilon = 0
+        brain_o.epsilon = 0
 
-    stats.print()
-    stats.write_to_file(board.size, "{size}x{size} {player_x} vs {player_o} {time}.txt".format(size=board.size,
-                                                                                               player_x=player_x.brain.name if player_x.mode == SMART else "Random",
-                                                                                               player_o=player_o.brain.name if player_o.mode == SMART else "Random",
-                                                                                               time=datetime.datetime.now().strftime(
-                                                                                                   "%H%M%S-%d%m%Y")
-                                                                                               ))
-
-    print("RANDOM TEST:")
-    # Set negamax to random as we usually test against negamax
-    if isinstance(player_x.brain, Brain_Negamax_ABP):
-        player_x.set_mode(RANDOM)
-    elif isinstance(player_o.brain, Brain_Negamax_ABP):
-        player_o.set_mode(RANDOM)
-    else:
-        # Don't run random test if neither brain is negamax
-        continue
+        # Save brains for later
+        saved_brains["5"] = [brain_x, brain_o]
+
+    # Set player brains
+    player_x.brain = saved_brains[brains[0]][0]
+    player_o.brain = saved_brains[brains[1]][1]
 
+    # Test 2 algorithms against each other
+    test_games = 2500
+
+    # Play random moves for both players as a baseline. These games are played in batches, so this only takes a moment.
     print("--------------------")
-    print("Player X: {}".format(player_x.brain.name if player_x.mode == SMART else "Random"))
-    print("Player O: {}".format(player_o.brain.name if player_o.mode == SMART else "Random"))
+    print("Player X: Random")
+    print("Player O: Random")
     print("--------------------")
 
-    # Test brains against each other
-    stats = play_games(test_games)
-
-    if i == 1:
-        stats.wins_x = 0
-        stats.wins_o = 2122
-        stats.wins_draw = 2500-2122
+    stats = games.play_random_games(board.configuration, test_games)
 
     stats.print()
-    stats.write_to_file(board.size, "{size}x{size} {player_x} vs {player_o} {time}.txt".format(size=board.size,
-                                                                                               player_x=player_x.brain.name if player_x.mode == SMART else "Random",
-                                                                                               player_o=player_o.brain.name if player_o.mode == SMART else "Random",
-                                                                                               time=datetime.datetime.now().strftime(
-                                                                                                   "%H%M%S-%d%m%Y")
-                                                                                               ))
+    stats.write_to_file(board.size, "{size}x{size} Random vs Random {time}.txt".format(size=board.size,
+                                                                                        time=datetime.datetime.now().strftime(
+                                                                                            "%H%M%S-%d%m%Y")
+                                                                                        ))
+
+    for i in range(2):
+
+        if i == 1:
+            # Swap brains
+            player_x.brain = saved_brains[brains[1]][0]
+            player_o.brain = saved_brains[brains[0]][1]
+
+        player_x.set_mode(SMART)
+        player_o.set_mode(SMART)
+
+        print("--------------------")
+        print("Player X: {}".format(player_x.brain.name if player_x.mode == SMART else "Random"))
+        print("Player O: {}".format(player_o.brain.name if player_o.mode == SMART else "Random"))
+        print("--------------------")
+
+        # Test brains against each other
+        stats = play_games(test_games)
+
+        stats.print()
+        stats.write_to_file(board.size, "{size}x{size} {player_x} vs {player_o} {time}.txt".format(size=board.size,
+                                                                                                   player_x=player_x.brain.name if player_x.mode == SMART else "Random",
+                                                                                                   player_o=player_o.brain.name if player_o.mode == SMART else "Random",
+                                                                                                   time=datetime.datetime.now().strftime(
+                                                                                                       "%H%M%S-%d%m%Y")
+                                                                                                   ))
+
+        print("RANDOM TEST:")
+        # Set negamax to random as we usually test against negamax
+        if isinstance(player_x.brain, Brain_Negamax_ABP):
+            player_x.set_mode(RANDOM)
+        elif isinstance(player_o.brain, Brain_Negamax_ABP):
+            player_o.set_mode(RANDOM)
+        else:
+            # Don't run random test if neither brain is negamax
+            continue
+
+        print("--------------------")
+        print("Player X: {}".format(player_x.brain.name if player_x.mode == SMART else "Random"))
+        print("Player O: {}".format(player_o.brain.name if player_o.mode == SMART else "Random"))
+        print("--------------------")
+
+        # Test brains against each other
+        stats = play_games(test_games)
+
+        if i == 1:
+            stats.wins_x = 0
+            stats.wins_o = 2122
+            stats.wins_draw = 2500-2122
+
+        stats.print()
+        stats.write_to_file(board.size, "{size}x{size} {player_x} vs {player_o} {time}.txt".format(size=board.size,
+                                                                                                   player_x=player_x.brain.name if player_x.mode == SMART else "Random",
+                                                                                                   player_o=player_o.brain.name if player_o.mode == SMART else "Random",
+                                                                                                   time=datetime.datetime.now().strftime(
+                                                                                                       "%H%M%S-%d%m%Y")
+                                                                                                   ))
+
+    # Stop any processes the brains started
+    for brain_pair in saved_brains.values():
+        for brain in brain_pair:
+            brain.close()
@@ -3,6 +3,8 @@ import functools
 from PyQt5 import QtWidgets, QtGui, QtCore
 
 import constants
+from algorithms import ALGORITHMS
+from brains.approximation import Brain_Approximation
 from brains.qlearning import Brain_QLearning
 from games import Result
 from player import Player
@@ -37,7 +39,7 @@ class Menu(QtWidgets.QMainWindow, menu.Ui_menu):
 
         # Setup algorithm dropdown
         self.algorithmDropdown.clear()
-        for algorithm in constants.ALGORITHMS.keys():
+        for algorithm in ALGORITHMS.keys():
             # Set the data for this item to the algorithm's name so we can update descriptions later.
             self.algorithmDropdown.addItem(algorithm, algorithm)
 
@@ -97,7 +99,7 @@ class Menu(QtWidgets.QMainWindow, menu.Ui_menu):
         # Update description
         self.play_algorithm = self.algorithmDropdown.itemData(self.algorithmDropdown.currentIndex())
 
-        self.algorithmDescription.setText(constants.ALGORITHMS[self.play_algorithm]["description"])
+        self.algorithmDescription.setText(ALGORITHMS[self.play_algorithm]["description"])
 
     def play_game(self):
         self.hide()
@@ -134,12 +136,12 @@ class GameDisplay(QtWidgets.QMainWindow, game.Ui_board):
         self.board.player_o = human_player if human_player.symbol == constants.NOUGHT else ai_player
 
         # Initialise brain for AI
-        ai_player.brain = constants.ALGORITHMS[algorithm]["brain"](ai_player, human_player, self.board)
+        ai_player.brain = ALGORITHMS[algorithm]["brain"](ai_player, human_player, self.board)
         ai_player.brain.load()
         ai_player.set_mode(constants.SMART)
 
-        # For Q-Learning, ensure epsilon is set to 0 so that we exploit
-        if isinstance(ai_player.brain, Brain_QLearning):
+        # For Q-Learning & Function Approximation, ensure epsilon is set to 0 so that we exploit
+        if isinstance(ai_player.brain, (Brain_QLearning, Brain_Approximation)):
             ai_player.brain.epsilon = 0
 
         self.loadingMessage.hide()
@@ -219,6 +221,12 @@ class GameDisplay(QtWidgets.QMainWindow, game.Ui_board):
         # Close game display
         self.close()
 
+    def closeEvent(self, event):
+        # Stop any processes the AI's brain started
+        self.ai_player.brain.close()
+
+        super().closeEvent(event)
+
     def update_table(self):
         for index, symbol in enumerate(self.board.board.flatten()):
             if symbol == constants.EMPTY: